@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Measures how a full conquers run scales with the number of hosts.
+
+For every fleet size a configuration with that many simulated switches
+(see ``simulated.py``) is run in a fresh process with a temporary
+``HOME``. The numbers are taken from the metrics of the run
+(``--metrics``):
+
+    * makespan: duration of the run
+    * hosts per second
+    * CPU time of the parent and of the workers
+    * peak RSS of the parent
+
+.. code-block:: console
+
+    $ python benchmarks/fleet.py --hosts 100 1000 10000 --forks 50 \\
+        --latency 0.05 --lines 100 --failure-rate 0.01 --engine fork
+
+Results are printed and saved as JSON (``--output``) to compare runs.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import ipaddress
+import platform
+import tempfile
+import subprocess
+from pathlib import Path
+
+import yaml
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# conquers libraries
+from credentials import Credentials
+from engines import ENGINES
+
+MASTER_KEY = "benchmark"
+
+def write_home(home, hosts, forks, report_types) -> dict:
+    """
+    Creates configuration, credentials and master key for **hosts**
+    simulated switches in **home** and returns their paths.
+    """
+
+    chome = home / ".conquers"
+    chome.mkdir(parents=True)
+
+    paths = {
+        "config": chome / "config.yaml",
+        "credentials": chome / "credentials",
+        "masterkey": home / "masterkey",
+        "metrics": home / "metrics"
+    }
+    paths["masterkey"].write_text(MASTER_KEY + "\n")
+    paths["credentials"].touch()
+
+    Credentials(
+        str(paths["credentials"]), str(paths["masterkey"])
+    ).add_entry({"user": "admin", "host": r"127\..*", "pass": "admin"})
+
+    # Addresses need no name resolution.
+    first = ipaddress.ip_address("127.0.0.1")
+    addresses = [str(first + i) for i in range(hosts)]
+
+    config = {
+        "defaults": {
+            "forks": forks,
+            "device_type": "cisco_ios",
+            "silent": True,
+            "report_types": report_types
+        },
+        "fleet": {
+            "cmds_before": ["show version"],
+            "conf_cmds": ["ntp server 192.0.2.1"],
+            "cmds_after": ["show running-config | include ntp"],
+            "hosts": [{address: None} for address in addresses]
+        }
+    }
+
+    with open(paths["config"], "w") as fh:
+        yaml.safe_dump(config, fh)
+
+    return paths
+
+def run(hosts, args) -> dict:
+    """
+    Runs conquers with **hosts** simulated switches and returns the
+    results.
+    """
+
+    home = Path(tempfile.mkdtemp(prefix="conquers-bench-"))
+
+    try:
+        paths = write_home(home, hosts, args.forks, args.report_types)
+        env = {
+            **os.environ,
+            "HOME": str(home),
+            "CONQUERS_SIM_LATENCY": str(args.latency),
+            "CONQUERS_SIM_LINES": str(args.lines),
+            "CONQUERS_SIM_FAILURE_RATE": str(args.failure_rate),
+            "CONQUERS_SIM_SEED": str(args.seed)
+        }
+        cmd = [
+            sys.executable, str(ROOT / "benchmarks" / "simulated.py"),
+            "--config", str(paths["config"]),
+            "--credentials", str(paths["credentials"]),
+            "-m", str(paths["masterkey"]),
+            "--engine", args.engine,
+            "--metrics", str(paths["metrics"]),
+            "--no-dns-cache"
+        ]
+
+        start = time.perf_counter()
+        proc = subprocess.run(
+            cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+        wall = time.perf_counter() - start
+
+        if proc.returncode != 0:
+            raise RuntimeError(
+                f"Run with {hosts} hosts failed:\n{proc.stderr.decode()}"
+            )
+
+        with open(paths["metrics"] / "metrics.json") as fh:
+            metrics = json.load(fh)
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+
+    makespan = metrics["duration_seconds"]
+
+    return {
+        "hosts": hosts,
+        "succeeded": metrics["hosts"]["succeeded"],
+        "failed": metrics["hosts"]["failed"],
+        "makespan_seconds": makespan,
+        "wall_seconds": round(wall, 6),
+        "hosts_per_second": round(hosts / makespan, 3) if makespan else None,
+        "parent_cpu_seconds": metrics["parent"]["cpu_seconds"],
+        "workers_cpu_seconds": metrics["workers"]["cpu_seconds"],
+        "peak_rss_bytes": metrics["parent"]["max_rss_bytes"],
+        "peak_concurrency": metrics["peak_concurrency"]
+    }
+
+def parse_options():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--hosts", type=int, nargs="+",
+                        default=[100, 1000, 10000],
+                        help="Fleet sizes to run. Default is 100 1000 10000.")
+    parser.add_argument("--forks", type=int, default=50,
+                        help="forks of the group. Default is 50.")
+    parser.add_argument("--engine", choices=[e for e in ENGINES if e != "daemon"],
+                        default="fork", help="Default is fork.")
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="""Seconds per connect and command set of a
+                        simulated switch. Default is 0.05.""")
+    parser.add_argument("--lines", type=int, default=100,
+                        help="Lines of output per command set. Default is 100.")
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="Share of failing switches (0-1). Default is 0.")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Selects which switches fail. Default is 0.")
+    parser.add_argument("--report-types", nargs="*",
+                        default=["html", "json", "yaml"],
+                        help="Reports to write. Default is html json yaml.")
+    parser.add_argument("--output", default=None,
+                        help="""JSON file for the results. Default is
+                        benchmark-<timestamp>.json.""")
+
+    return parser.parse_args()
+
+def main():
+    args = parse_options()
+    output = args.output or time.strftime("benchmark-%Y%m%d-%H%M%S.json")
+    results = []
+
+    print(
+        "{:>8} {:>9} {:>10} {:>10} {:>10} {:>10} {:>8}".format(
+            "hosts", "makespan", "hosts/s", "cpu", "workers", "rss MiB", "failed"
+        )
+    )
+
+    for hosts in args.hosts:
+        result = run(hosts, args)
+        results.append(result)
+        print(
+            "{hosts:>8} {makespan_seconds:>9.2f} {hosts_per_second:>10.1f} "
+            "{parent_cpu_seconds:>10.2f} {workers_cpu_seconds:>10.2f} "
+            "{rss:>10.1f} {failed:>8}".format(
+                rss=result["peak_rss_bytes"] / 2**20, **result
+            )
+        )
+
+    with open(output, "w") as fh:
+        json.dump(
+            {
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "parameters": {
+                    k: v for k, v in vars(args).items() if k != "output"
+                },
+                "results": results
+            },
+            fh,
+            indent=2
+        )
+
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
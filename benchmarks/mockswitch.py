@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+"""
+A local SSH server that pretends to be switches, to test and load test
+conquers without real ones.
+
+One process serves any number of virtual switches, each on its own port.
+They speak enough of the ``cisco_ios`` and ``huawei`` CLI for netmiko's
+``ConnectHandler`` to drive them: prompts, paging off, configuration mode
+(``configure terminal``/``end``, ``system-view``/``return``), interface
+views, and interactive commands that ask questions, which is what the
+expect syntax of the configuration is for:
+
+    * cisco_ios: ``copy running-config startup-config`` asks for the
+      destination filename, ``copy scp://...`` for the source username and
+      the destination filename.
+    * huawei: ``save`` asks ``Continue? [Y/N]``.
+
+Configuration commands are kept per session and show up in ``show
+running-config`` and ``display current-configuration``, every other show
+or display command returns ``--output-lines`` lines.
+
+.. code-block:: console
+
+    $ python benchmarks/mockswitch.py --cisco-ios 200 --huawei 100 \\
+        --base-port 10022 --latency 0.05 --inventory /tmp/mock.csv
+
+``--inventory`` writes a CSV file of all switches (columns ``host``,
+``port`` and ``device_type``) to use as inventory (see
+:py:mod:`inventory`) with ``settings_columns: [port, device_type]``. Any
+user name and password are accepted unless ``--username`` and
+``--password`` are given.
+"""
+import re
+import sys
+import csv
+import time
+import signal
+import socket
+import argparse
+import threading
+import selectors
+import paramiko
+
+EOL = re.compile(r"\r\n|\r|\n")
+
+class MockDevice:
+    """
+    The CLI of one session with a virtual switch.
+
+    Attributes:
+        hostname (str): Used in the prompts.
+        output_lines (int): Lines of output of a show command.
+        views (list): Stack of the views entered, the last one is the
+            current one. Empty in the exec/user view.
+        running_config (list): Configuration commands of this session.
+        dialogue (generator): The interactive command waiting for an
+            answer, see :py:meth:`execute`.
+    """
+
+    device_type = None
+    PAGING = ()
+    """
+    Commands that set up the terminal, they are silently accepted.
+    """
+
+    def __init__(self, hostname, output_lines=20) -> None:
+        self.hostname = hostname
+        self.output_lines = output_lines
+        self.views = []
+        self.running_config = []
+        self.dialogue = None
+
+    def prompt(self) -> str:
+        raise NotImplementedError
+
+    def command(self, line):
+        """
+        Returns the output of **line** or a generator for an interactive
+        command, ``None`` ends the session.
+        """
+
+        raise NotImplementedError
+
+    def execute(self, line):
+        """
+        Executes **line** and returns its output, ``None`` ends the session.
+
+        An interactive command is a generator that yields its questions and
+        receives the answers. While it waits for an answer, the next line
+        goes to it and no prompt is shown.
+        """
+
+        if self.dialogue is not None:
+            return self.ask(lambda: self.dialogue.send(line))
+
+        result = self.command(line)
+
+        if hasattr(result, "send"):
+            self.dialogue = result
+            return self.ask(lambda: next(result))
+
+        return result
+
+    def ask(self, step) -> str:
+        try:
+            return step()
+        except StopIteration as e:
+            self.dialogue = None
+            return e.value
+
+    def output(self, cmd) -> str:
+        return "\r\n".join(
+            f"{self.hostname} {cmd} {i:05d} " + "-" * 40
+            for i in range(self.output_lines)
+        )
+
+class CiscoIos(MockDevice):
+    device_type = "cisco_ios"
+    PAGING = ("terminal length 0", "terminal width 511")
+
+    def prompt(self) -> str:
+        if not self.views:
+            return f"{self.hostname}#"
+
+        return f"{self.hostname}({self.views[-1]})#"
+
+    def command(self, line):
+        cmd = line.strip()
+
+        if cmd == "" or cmd in self.PAGING:
+            return ""
+
+        if cmd == "exit":
+            if not self.views:
+                return None
+
+            self.views.pop()
+            return ""
+
+        if cmd == "end":
+            self.views = []
+            return ""
+
+        if self.views:
+            if cmd.startswith("interface "):
+                self.views = ["config", "config-if"]
+
+            self.running_config.append(cmd)
+            return ""
+
+        if cmd in ("configure terminal", "conf t"):
+            self.views = ["config"]
+            return "Enter configuration commands, one per line.  " +\
+                "End with CNTL/Z."
+
+        if cmd.startswith("show run"):
+            return "\r\n".join(
+                ["Building configuration...", "", f"hostname {self.hostname}"]
+                + self.running_config
+                + ["end"]
+            )
+
+        if cmd.startswith("show "):
+            return self.output(cmd)
+
+        if cmd.startswith("copy "):
+            return self.copy(*cmd.split()[1:3])
+
+        return f"{' ' * len(self.prompt())}^\r\n" +\
+            "% Invalid input detected at '^' marker."
+
+    def copy(self, source, destination):
+        if source == "running-config":
+            yield f"Destination filename [{destination}]? "
+            return "Building configuration...\r\n[OK]"
+
+        name = source.rstrip("/").split("/")[-1]
+
+        if "://" in source:
+            yield "Source username [admin]? "
+
+        yield f"Destination filename [{name}]? "
+
+        return f"Accessing {source}...!!!!!!\r\n" +\
+            "4096000 bytes copied in 2.048 secs (2000000 bytes/sec)"
+
+class Huawei(MockDevice):
+    device_type = "huawei"
+    PAGING = ("screen-length 0 temporary",)
+
+    def prompt(self) -> str:
+        if not self.views:
+            return f"<{self.hostname}>"
+
+        if len(self.views) == 1:
+            return f"[{self.hostname}]"
+
+        return f"[{self.hostname}-{self.views[-1]}]"
+
+    def command(self, line):
+        cmd = line.strip()
+
+        if cmd == "":
+            return ""
+
+        if cmd in self.PAGING:
+            return "Info: The configuration takes effect on the current " +\
+                "user terminal interface only."
+
+        if cmd == "quit":
+            if not self.views:
+                return None
+
+            self.views.pop()
+            return ""
+
+        if cmd == "return":
+            self.views = []
+            return ""
+
+        if self.views:
+            if cmd.startswith("interface "):
+                self.views = ["system", cmd.split(maxsplit=1)[1]]
+
+            self.running_config.append(cmd)
+            return ""
+
+        if cmd == "system-view":
+            self.views = ["system"]
+            return "Enter system view, return user view with Ctrl+Z."
+
+        if cmd.startswith("display current"):
+            return "\r\n".join(
+                ["#", f" sysname {self.hostname}", "#"]
+                + self.running_config
+                + ["#", "return"]
+            )
+
+        if cmd.startswith("display "):
+            return self.output(cmd)
+
+        if cmd == "save":
+            return self.save()
+
+        return "Error: Unrecognized command found at '^' position."
+
+    def save(self):
+        answer = yield "Warning: The current configuration will be written " +\
+            "to the device. Continue? [Y/N]:"
+
+        if answer.strip().lower() != "y":
+            return "Info: Operation cancelled."
+
+        return "Now saving the current configuration to the slot 0.\r\n" +\
+            "Info: Save the configuration successfully."
+
+DEVICES = {
+    "cisco_ios": CiscoIos,
+    "huawei": Huawei
+}
+
+class _Interface(paramiko.ServerInterface):
+    def __init__(self, username, password) -> None:
+        self.username = username
+        self.password = password
+
+    def check_auth_password(self, username, password):
+        if self.username is not None and username != self.username:
+            return paramiko.AUTH_FAILED
+
+        if self.password is not None and password != self.password:
+            return paramiko.AUTH_FAILED
+
+        return paramiko.AUTH_SUCCESSFUL
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(self, *args):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        return True
+
+class MockServer:
+    """
+    Serves the virtual switches.
+
+    Attributes:
+        devices (dict): Port -> device type.
+        address (str): Address to listen on.
+        host_key (paramiko.PKey): Shared by all switches.
+        username (str): Accepted user name, ``None`` accepts any.
+        password (str): Accepted password, ``None`` accepts any.
+        latency (float): Seconds before a command is answered.
+        connect_latency (float): Seconds before the first prompt.
+        output_lines (int): Lines of output of a show command.
+        sessions (int): Number of sessions opened so far.
+    """
+
+    def __init__(self, devices, address="127.0.0.1", host_key=None,
+                 username=None, password=None, latency=0.0,
+                 connect_latency=0.0, output_lines=20) -> None:
+        self.devices = devices
+        self.address = address
+        self.host_key = host_key or paramiko.RSAKey.generate(2048)
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.output_lines = output_lines
+        self.sessions = 0
+        self.lock = threading.Lock()
+
+    def serve(self) -> None:
+        """
+        Listens on the ports of all switches until interrupted.
+        """
+
+        selector = selectors.DefaultSelector()
+
+        for port in self.devices:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((self.address, port))
+            sock.listen(128)
+            sock.setblocking(False)
+            selector.register(sock, selectors.EVENT_READ, port)
+
+        try:
+            while True:
+                for key, mask in selector.select():
+                    try:
+                        conn, addr = key.fileobj.accept()
+                    except BlockingIOError:
+                        continue
+
+                    conn.setblocking(True)
+                    threading.Thread(
+                        target=self.handle, args=(conn, key.data), daemon=True
+                    ).start()
+        finally:
+            for key in list(selector.get_map().values()):
+                key.fileobj.close()
+
+            selector.close()
+
+    def handle(self, conn, port) -> None:
+        """
+        Runs the SSH session on **conn** with the switch on **port**.
+        """
+
+        with self.lock:
+            self.sessions += 1
+
+        transport = paramiko.Transport(conn)
+        transport.add_server_key(self.host_key)
+
+        try:
+            transport.start_server(
+                server=_Interface(self.username, self.password)
+            )
+            channel = transport.accept(30)
+
+            if channel is None:
+                return
+
+            device = DEVICES[self.devices[port]](
+                f"sw{port}", self.output_lines
+            )
+            self.shell(channel, device)
+        except (EOFError, OSError, paramiko.SSHException):
+            pass
+        finally:
+            transport.close()
+
+    def shell(self, channel, device) -> None:
+        time.sleep(self.connect_latency)
+        channel.sendall(f"\r\n{device.prompt()}")
+        buffer = ""
+
+        while data := channel.recv(4096):
+            buffer += data.decode(errors="replace")
+
+            # netmiko ends lines with \n, a terminal with \r.
+            while match := EOL.search(buffer):
+                line = buffer[:match.start()]
+                buffer = buffer[match.end():]
+
+                if line.strip() and self.latency:
+                    time.sleep(self.latency)
+
+                output = device.execute(line)
+
+                if output is None:
+                    channel.sendall(f"{line}\r\n")
+                    return
+
+                reply = f"{line}\r\n"
+
+                if output:
+                    reply += output
+
+                if device.dialogue is None:
+                    reply += ("\r\n" if output else "") + device.prompt()
+
+                channel.sendall(reply)
+
+def write_inventory(path, address, devices) -> None:
+    with open(path, "w", newline="") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(["host", "port", "device_type"])
+
+        for port, device_type in devices.items():
+            writer.writerow([address, port, device_type])
+
+def parse_options():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--address", default="127.0.0.1",
+                        help="Address to listen on. Default is 127.0.0.1.")
+    parser.add_argument("--base-port", type=int, default=10022,
+                        help="""Port of the first switch, the others follow.
+                        Default is 10022.""")
+    for device_type in DEVICES:
+        parser.add_argument(f"--{device_type.replace('_', '-')}", type=int,
+                            default=0, dest=device_type,
+                            help=f"Number of {device_type} switches.")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Seconds before a command is answered.")
+    parser.add_argument("--connect-latency", type=float, default=0.0,
+                        help="Seconds before the first prompt.")
+    parser.add_argument("--output-lines", type=int, default=20,
+                        help="Lines of output of a show command. Default is 20.")
+    parser.add_argument("--username", default=None,
+                        help="Only accept this user name.")
+    parser.add_argument("--password", default=None,
+                        help="Only accept this password.")
+    parser.add_argument("--host-key", default=None,
+                        help="""Private RSA key file of the server. A new one
+                        is generated by default.""")
+    parser.add_argument("--inventory", default=None,
+                        help="Write a CSV inventory of all switches to this file.")
+
+    return parser.parse_args()
+
+def main():
+    args = parse_options()
+    devices = {}
+    port = args.base_port
+
+    for device_type in DEVICES:
+        for i in range(getattr(args, device_type)):
+            devices[port] = device_type
+            port += 1
+
+    if not devices:
+        sys.exit("No switches, use e.g. --cisco-ios 10 --huawei 10.")
+
+    if args.inventory is not None:
+        write_inventory(args.inventory, args.address, devices)
+
+    server = MockServer(
+        devices,
+        address=args.address,
+        host_key=paramiko.RSAKey.from_private_key_file(args.host_key)
+            if args.host_key else None,
+        username=args.username,
+        password=args.password,
+        latency=args.latency,
+        connect_latency=args.connect_latency,
+        output_lines=args.output_lines
+    )
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+    print(
+        f"Serving {len(devices)} switches on {args.address} " +
+        f"ports {args.base_port}-{port - 1}",
+        flush=True
+    )
+
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Runs conquers against simulated switches instead of real ones.
+
+netmiko's ``ConnectHandler`` is replaced by :py:class:`SimulatedDevice`,
+everything else (configuration, credentials, scheduling, engines, IPC,
+collector and reports) is the real code. Used by ``fleet.py``:
+
+.. code-block:: console
+
+    $ CONQUERS_SIM_LATENCY=0.05 python benchmarks/simulated.py --config ...
+
+The simulated switches are configured with environment variables:
+
+    * ``CONQUERS_SIM_LATENCY``: seconds per connect and per command set
+      (default 0.05)
+    * ``CONQUERS_SIM_LINES``: lines of output per command set (default 100)
+    * ``CONQUERS_SIM_FAILURE_RATE``: share of switches that refuse the
+      connection, from 0 to 1 (default 0)
+    * ``CONQUERS_SIM_SEED``: makes the failing switches reproducible
+      (default 0)
+"""
+import os
+import sys
+import time
+import zlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# conquers libraries
+import switch
+import conquers
+
+LATENCY = float(os.environ.get("CONQUERS_SIM_LATENCY", 0.05))
+LINES = int(os.environ.get("CONQUERS_SIM_LINES", 100))
+FAILURE_RATE = float(os.environ.get("CONQUERS_SIM_FAILURE_RATE", 0))
+SEED = os.environ.get("CONQUERS_SIM_SEED", "0")
+
+class SimulatedDevice:
+    """
+    Answers like a netmiko connection after **LATENCY** seconds.
+
+    Whether a switch fails is derived from its address and **SEED**, so
+    the same switches fail in every run.
+    """
+
+    def __init__(self, device_type=None, ip=None, username=None,
+                 password=None, **kwargs) -> None:
+        self.ip = ip
+        self.alive = True
+
+        # Same switch, same fate.
+        if zlib.crc32(f"{SEED}:{ip}".encode()) / 2**32 < FAILURE_RATE:
+            time.sleep(LATENCY)
+            raise ConnectionRefusedError(f"Simulated failure of {ip}")
+
+        time.sleep(LATENCY)
+
+    def output(self, cmds) -> str:
+        time.sleep(LATENCY)
+
+        return "\n".join(
+            f"{self.ip} {cmds[0] if cmds else ''} line {i:06d} " + "x" * 32
+            for i in range(LINES)
+        )
+
+    def send_config_set(self, cmds, **kwargs) -> str:
+        return self.output(cmds)
+
+    def send_multiline_timing(self, cmds, **kwargs) -> str:
+        return self.output(cmds)
+
+    def send_command_timing(self, cmd, **kwargs) -> str:
+        return self.output([cmd])
+
+    def config_mode(self, **kwargs) -> str:
+        return ""
+
+    def exit_config_mode(self, **kwargs) -> str:
+        return ""
+
+    def is_alive(self) -> bool:
+        return self.alive
+
+    def disconnect(self) -> None:
+        self.alive = False
+
+if __name__ == "__main__":
+    switch.ConnectHandler = SimulatedDevice
+    conquers.main()
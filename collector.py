@@ -1,7 +1,26 @@
+import os
+import sys
+import shutil
+import queue
+import tempfile
+import threading
+from array import array
 from pathlib import Path
+from collections import ChainMap
 import json
 import yaml
+# Use libyaml's C emitter if PyYAML was built with it.
+try:
+    from yaml import CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeDumper
+# Use orjson if it is installed, it is several times faster.
+try:
+    import orjson
+except ImportError:
+    orjson = None
 from colorama import init, Fore, Style
+from colorama.ansitowin32 import AnsiToWin32
 from constants import Constants as Const
 
 init(autoreset=True)            # Reset color.
@@ -9,6 +28,193 @@ init(autoreset=True)            # Reset color.
 class CollectorError(Exception):
     pass
 
+class ReportDumper(SafeDumper):
+    """
+    Dumps layered host settings (``ChainMap``) like plain dictionaries.
+    Settings are shared between hosts, so aliases are disabled to keep
+    every host's entry self-contained.
+    """
+
+    def ignore_aliases(self, data) -> bool:
+        return True
+
+ReportDumper.add_representer(
+    ChainMap,
+    lambda dumper, data: dumper.represent_dict(dict(data))
+)
+
+def json_default(obj):
+    """
+    ``default`` for ``json.dumps``: serializes ``ChainMap`` settings.
+    """
+
+    if isinstance(obj, ChainMap):
+        return dict(obj)
+
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def json_dumps(obj, indent=None) -> str:
+    """
+    Serializes **obj** like ``json.dumps`` with **indent**, compact if it is
+    ``None``. orjson is used if it is installed and supports **indent**
+    (none or 2).
+    """
+
+    if orjson is not None and indent in (None, 2):
+        option = orjson.OPT_NON_STR_KEYS
+
+        if indent:
+            option |= orjson.OPT_INDENT_2
+
+        return orjson.dumps(obj, default=json_default, option=option).decode()
+
+    if indent is None:
+        return json.dumps(obj, default=json_default, separators=(",", ":"))
+
+    return json.dumps(obj, indent=indent, default=json_default)
+
+json_loads = orjson.loads if orjson is not None else json.loads
+"""
+``json.loads``, or orjson's if it is installed.
+"""
+
+class ConsoleOutput:
+    """
+    Prints on a thread of its own, fed by a bounded queue, so the loop
+    collecting results neither renders summaries nor writes to the
+    terminal. Everything is printed in the order it was queued. If the
+    terminal falls behind until the queue is full, queueing waits for it,
+    nothing is left out. Forked children and the thread itself print
+    directly.
+
+    The thread prints to a stream of its own on the file descriptor of
+    ``sys.stdout``, which the parent leaves alone while it runs. So a
+    child is never forked while ``sys.stdout`` is locked and forking never
+    waits for the terminal.
+
+    Attributes:
+        queue (queue.Queue):
+            ``(function, args, kwargs)`` to call, ``None`` stops the thread.
+
+        stream (io.TextIOBase):
+            Line buffered, colored or stripped by colorama like
+            ``sys.stdout``. Only used by the thread.
+
+        thread (threading.Thread):
+            Calls what is queued.
+
+        pid (int):
+            Process that queues.
+    """
+
+    def __init__(self, maxsize):
+        self.queue = queue.Queue(maxsize)
+        self.stream = None
+        self.thread = threading.Thread(
+            target=self.run,
+            name="console-output",
+            daemon=True
+        )
+        self.pid = os.getpid()
+
+    def start(self) -> None:
+        sys.stdout.flush()
+        self.stream = AnsiToWin32(
+            open(
+                sys.stdout.fileno(),
+                "w",
+                encoding=sys.stdout.encoding,
+                errors="replace",
+                closefd=False,
+                buffering=1
+            ),
+            autoreset=True
+        ).stream
+        self.thread.start()
+
+    def stop(self) -> None:
+        """
+        Prints what is left in the queue and stops the thread.
+        """
+
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+    def direct(self) -> bool:
+        """
+        Returns whether to call right away instead of queueing.
+        """
+
+        return os.getpid() != self.pid or not self.thread.is_alive() or \
+            threading.current_thread() is self.thread
+
+    def call(self, func, args=(), kwargs=None) -> None:
+        """
+        Queues a call of **func**, waits if the queue is full.
+        """
+
+        if self.direct():
+            func(*args, **(kwargs or {}))
+        else:
+            self.queue.put((func, args, kwargs or {}))
+
+    def print(self, *args, **kwargs) -> None:
+        if threading.current_thread() is self.thread:
+            print(*args, file=self.stream, **kwargs)
+        else:
+            print(*args, **kwargs)
+
+    def run(self) -> None:
+        while True:
+            item = self.queue.get()
+
+            if item is None:
+                self.stream.flush()
+                return
+
+            func, args, kwargs = item
+
+            try:
+                func(*args, **kwargs)
+            # Output must not end the run.
+            except Exception as e:
+                self.print(f"{Style.NORMAL}{Fore.RED}[OUTPUT] {e}")
+# ---- class ConsoleOutput END -------------------------------------------------
+
+def expand_report(report) -> dict:
+    """
+    Returns **report**, a json or yaml report as read from the file, in the
+    structure of version 1: ``{group: [{host: result}, ...]}`` where every
+    result holds all of its settings. Reports of version 1 are returned as
+    they are.
+    """
+
+    if "version" not in report:
+        return report
+
+    if report["version"] > Collector.REPORT_VERSION:
+        raise CollectorError(
+            f'Report version {report["version"]} is not supported, '
+            f'the latest is {Collector.REPORT_VERSION}'
+        )
+
+    expanded = {}
+
+    for group, obj in report["groups"].items():
+        expanded[group] = []
+
+        for host in obj["hosts"]:
+            switch = next(iter(host))
+            result = dict(host[switch])
+            result["config"] = dict(result["config"])
+            result["config"]["settings"] = {
+                **obj["settings"], **result["config"]["settings"]
+            }
+            expanded[group].append({switch: result})
+
+    return expanded
+
 class Collector:
     """
     A class to collect, format and print information gathered from hosts.
@@ -34,148 +240,293 @@ class Collector:
             html snippet for html report.
             See :py:class:`constants.Constants.HTML_BOTTOM`.
 
-        collected_objects (list): 
-            .. code-block:: python
-                :caption: Something like this depending on the configuration
-
-                [
-                	{
-                		"group": "awesomegroup",
-                		"host": "some-switch",
-                		"errors": [],
-                		"rc": 0,
-                		"output": {
-                			"cmds_before": [
-                				"ip name-server 8.8.8.8"
-                			],
-                			"cmds_after": [
-                				"ip name-server 9.9.9.9"
-                			]
-                		},
-                		"message": "ok",
-                		"config": {
-                			"settings": {
-                				"device_type": "cisco_ios",
-                				"connection_timeout": 10,
-                				"read_timeout": 10,
-                				"silent": True,
-                				"conf_cmds": [
-                					"no ip name-server 8.8.8.8",
-                					"ip name-server 9.9.9.9"
-                				],
-                				"cmds_before": [
-                					"show run | include name-server"
-                				],
-                				"cmds_after": [
-                					"show run | include name-server"
-                				],
-                				"log_file": "~/.conquers/some-switch.log"
-                			},
-                			"credentials": {
-                				"user": "admin",
-                				"host": "some-switch",
-                				"encrypted_pass": "********",
-                				"pass": "********"
-                			}
-                		}
-                	},
-                ]
+        spool_file (str):
+            Every result is appended to this `JSON Lines
+            <https://jsonlines.org/>`_ file as soon as it arrives, so
+            results survive a crash and are not kept in memory. The
+            summary and the reports are built from it at the end. By
+            default every run spools to a file of its own in
+            ``~/.conquers``, which :py:meth:`close` renames to
+            ``~/.conquers/report.jsonl`` once the reports are written, so
+            runs at the same time do not overwrite each other's results.
+
+            The settings of a group are written once, before its first
+            result, hosts only keep their overrides, see
+            :py:attr:`groups`.
 
-        hosts_by_group (dict):
-            .. code-block:: python
-                :caption: Something like this depending on the configuration
+            .. code-block:: json
+                :caption: The settings of a group
 
                 {
-                    "awesomegroup": [
-                        {
-                            "another-switch": {
-                                "errors": [],
-                                "rc": null,
-                                "message": "skipped",
-                                "config": {
-                                    "host": "another-switch",
-                                    "settings": {
-                                        "device_type": "cisco_ios",
-                                        "connection_timeout": 10,
-                                        "read_timeout": 10,
-                                        "silent": true
-                                    },
-                                    "credentials": false
-                                }
-                            }
-                        },
-                        {
-                            "some-switch": {
-                                "errors": [],
-                                "rc": 0,
-                                "output": {
-                                    "cmds_before": [
-                                        "ip name-server 8.8.8.8"
-                                    ],
-                                    "cmds_after": [
-                                        "ip name-server 9.9.9.9"
-                                    ]
-                                },
-                                "message": "ok",
-                                "config": {
-                                    "settings": {
-                                        "device_type": "cisco_ios",
-                                        "connection_timeout": 10,
-                                        "read_timeout": 10,
-                                        "silent": true,
-                                        "conf_cmds": [
-                                            "no ip name-server 8.8.8.8",
-                                            "ip name-server 9.9.9.9"
-                                        ],
-                                        "cmds_before": [
-                                            "show run | include name-server"
-                                        ],
-                                        "cmds_after": [
-                                            "show run | include name-server"
-                                        ],
-                                        "log_file": "~/.conquers/some-switch.log"
-                                    },
-                                    "credentials": {
-                                        "user": "admin",
-                                        "host": "some-switch",
-                                        "encrypted_pass": "********",
-                                        "pass": "********"
-                                    }
-                                }
-                            }
-                        }
-                    ],
-                    "anothergroup": [
-                        "..."
-                    ],
+                	"group": "awesomegroup",
+                	"settings": {
+                		"device_type": "cisco_ios",
+                		"connection_timeout": 10,
+                		"read_timeout": 10,
+                		"silent": true,
+                		"conf_cmds": [
+                			"no ip name-server 8.8.8.8",
+                			"ip name-server 9.9.9.9"
+                		],
+                		"cmds_before": [
+                			"show run | include name-server"
+                		],
+                		"cmds_after": [
+                			"show run | include name-server"
+                		]
+                	}
                 }
 
+            .. code-block:: json
+                :caption: A result looks like this, depending on the configuration
+
+                {
+                	"group": "awesomegroup",
+                	"host": "some-switch",
+                	"errors": [],
+                	"rc": 0,
+                	"output": {
+                		"cmds_before": [
+                			"ip name-server 8.8.8.8"
+                		],
+                		"cmds_after": [
+                			"ip name-server 9.9.9.9"
+                		]
+                	},
+                	"message": "ok",
+                	"timings": {
+                		"resolve": 0.002,
+                		"connect": 1.84,
+                		"cmds_before": 0.61,
+                		"config_mode_enter": 0.2,
+                		"config_mode_exit": 0.19,
+                		"conf_cmds": 1.02,
+                		"cmds_after": 0.58,
+                		"cmd_sets": {
+                			"cmds_before": [0.61],
+                			"conf_cmds": [0.63],
+                			"cmds_after": [0.58]
+                		},
+                		"total": 4.05
+                	},
+                	"config": {
+                		"settings": {
+                			"log_file": "~/.conquers/some-switch.log"
+                		},
+                		"credentials": {
+                			"user": "admin",
+                			"host": "some-switch",
+                			"encrypted_pass": "********",
+                			"pass": "********"
+                		}
+                	}
+                }
+
+        offsets (dict):
+            Group -> offsets of its lines in the spool, in the order the
+            results arrived.
+
+        groups (dict):
+            Group -> its settings, see :py:meth:`add_group`. Stored once,
+            results in the spool and the reports only hold the settings of
+            a host that differ from them.
+
+        report_types (list):
+            ``report_types`` of the first result.
+    """
+
+    TIMING_COLUMNS = {
+        "DNS": "resolve",
+        "Connect": "connect",
+        "Before": "cmds_before",
+        "Conf": "conf_cmds",
+        "After": "cmds_after",
+        "Total": "total"
+    }
+    """
+    Columns of the summary showing ``timings`` of a host, see
+    :py:func:`engines.run_host`.
+    """
+
+    OUTPUT_QUEUE_SIZE = 1024
+    """
+    Number of calls :py:class:`ConsoleOutput` holds before queueing waits
+    for the terminal.
+    """
+
+    output = None
+    """
+    :py:class:`ConsoleOutput` that prints while hosts are run, see
+    :py:meth:`start_output`. Without, all is printed directly.
+    """
+
+    REPORT_VERSION = 2
+    """
+    Version of the structure of the reports, see :py:meth:`hosts_by_group`.
+    Reports without ``version`` are version 1, see :py:func:`expand_report`.
+    """
+
+    SHARD_BYTES = 1048576
+    """
+    Size in bytes at which a shard of the html report is complete, see
+    :py:meth:`write_html`.
     """
 
-    def __init__(self):
-        self.collected_objects = []
-        self.hosts_by_group = {}
+    REPORT_BATCH = 64
+    """
+    Number of hosts serialized at once when writing the yaml and json
+    reports.
+    """
+
+    INDEX_ID = "report-index"
+    """
+    ``id`` of the script element holding the index of the html report, see
+    :py:meth:`write_html`.
+    """
+
+    INDEX_ERROR_LENGTH = 200
+    """
+    Characters of the first error of a host kept in the index of the html
+    report, see :py:meth:`write_html`.
+    """
+
+    def __init__(self, spool_file=None):
+        self.spool_file = spool_file
+        self.spool_target = None
+        self.spool = None
+        self.offsets = {}
+        self.groups = {}
+        self.report_types = None
         self.json_indentation = 4
         self.htmltop = Const.HTML_TOP
         self.htmlbottom = Const.HTML_BOTTOM
 
+    def open_spool(self) -> None:
+        """
+        Creates the spool. Without **spool_file**, it is a new file in
+        :py:attr:`constants.Constants.CHOME_ABS_PATH` only this run writes
+        to, see :py:meth:`close`.
+        """
+
+        try:
+            if self.spool_file is None:
+                fd, self.spool_file = tempfile.mkstemp(
+                    prefix="report-",
+                    suffix=".jsonl.part",
+                    dir=Const.CHOME_ABS_PATH
+                )
+                self.spool_target = os.path.join(
+                    Const.CHOME_ABS_PATH, Const.REPORT_SPOOL
+                )
+                self.spool = os.fdopen(fd, "wb")
+            else:
+                self.spool = open(self.spool_file, "wb")
+        except OSError as e:
+            raise CollectorError(e) from e
+
+    def add_group(self, group, settings) -> None:
+        """
+        Records the **settings** all hosts of **group** share, usually
+        the group's layer of the settings, see
+        :py:func:`conquers.gen_switch_config_objects`.
+        """
+
+        # Compared with results read back from JSON.
+        self.groups[group] = json_loads(json_dumps(settings))
+
     def add_to_collection(self, item) -> None:
         """
-        Adds **item** to **collected_objects**
+        Appends **item** to the spool with only the settings that differ
+        from those of its group. The settings of a group that was not added
+        with :py:meth:`add_group` are those of its first result.
 
         Parameters
         ----------
         item : dict
-            Object to add
+            Object to add, it is not changed.
         """
-        self.collected_objects.append(item)
 
-    def __build_complete_summary(self) -> None:
-        for host_item in self.collected_objects:
-            # Create group if it doesn't exist.
-            if host_item["group"] not in self.hosts_by_group:
-                self.hosts_by_group[host_item["group"]] = []
+        if self.spool is None:
+            self.open_spool()
+
+        settings = item["config"]["settings"]
+
+        if self.report_types is None:
+            try:
+                self.report_types = settings["report_types"]
+            # report_types is not defined in the configuration.
+            except Exception as e:
+                self.report_types = ""
+
+        group = item["group"]
+
+        if group not in self.groups:
+            self.add_group(group, settings)
+
+        if group not in self.offsets:
+            self.offsets[group] = array("Q")
+            self.spool.write(
+                json_dumps(
+                    {"group": group, "settings": self.groups[group]}
+                ).encode("utf-8") + b"\n"
+            )
+
+        group_settings = self.groups[group]
+        item = dict(item)
+        item["config"] = dict(item["config"])
+        item["config"]["settings"] = {
+            k: v for k, v in settings.items()
+            if k not in group_settings or group_settings[k] != v
+        }
+
+        self.offsets[group].append(self.spool.tell())
+        self.spool.write(json_dumps(item).encode("utf-8") + b"\n")
+        # Nothing is lost if the parent dies.
+        self.spool.flush()
+
+    def close(self) -> None:
+        """
+        Closes the spool. A spool of this run only is renamed to
+        :py:attr:`constants.Constants.REPORT_SPOOL`, replacing the one of
+        an earlier run, so call it after the reports are written.
+        """
+
+        if self.spool is not None:
+            self.spool.close()
+            self.spool = None
+
+        if self.spool_target is not None:
+            try:
+                os.replace(self.spool_file, self.spool_target)
+            except OSError as e:
+                raise CollectorError(e) from e
 
+            self.spool_file = self.spool_target
+            self.spool_target = None
+
+    def read_group(self, group):
+        """
+        Yields the results of **group** from the spool, in the order they
+        arrived, one at a time.
+        """
+
+        if group not in self.offsets:
+            return
+
+        with open(self.spool_file, "rb") as fh:
+            for offset in self.offsets[group]:
+                fh.seek(offset)
+                yield json_loads(fh.readline())
+
+    def hosts(self, group):
+        """
+        Yields the hosts of **group** as they appear in the reports:
+        ``{host: result}``, where result lacks ``group`` and ``host`` and
+        only holds the settings that differ from those of the group, see
+        :py:meth:`settings`.
+        """
+
+        for host_item in self.read_group(group):
             # Create host object with keys and values.
             host = {}
             for key in host_item:
@@ -184,13 +535,366 @@ class Collector:
 
                 host[key] = host_item[key]
 
-            # Add host to group
-            self.hosts_by_group[host_item["group"]].append(
-                {
-                    host_item["host"]: host
+            yield {
+                host_item["host"]: host
+            }
+
+    def settings(self, group) -> dict:
+        """
+        Returns the settings shared by the hosts of **group**.
+        """
+
+        return self.groups.get(group, {})
+
+    def host_settings(self, group, result) -> ChainMap:
+        """
+        Returns the settings of a **result** yielded by :py:meth:`hosts`:
+        its overrides layered over the settings of **group**.
+        """
+
+        return ChainMap(result["config"]["settings"], self.settings(group))
+
+    def hosts_by_group(self):
+        """
+        Yields ``(group, hosts)`` for all groups in the order they first
+        appeared, hosts is an iterator, see :py:meth:`hosts`. Together with
+        :py:meth:`settings` this is the structure of the reports, version
+        **REPORT_VERSION**. Settings of a group are stored once, a host only
+        holds those it overrides, see :py:func:`expand_report`:
+
+        .. code-block:: python
+            :caption: Something like this depending on the configuration
+
+            {
+                "version": 2,
+                "groups": {
+                    "awesomegroup": {
+                        "settings": {
+                            "device_type": "cisco_ios",
+                            "connection_timeout": 10,
+                            "read_timeout": 10,
+                            "silent": true,
+                            "conf_cmds": [
+                                "no ip name-server 8.8.8.8",
+                                "ip name-server 9.9.9.9"
+                            ],
+                            "cmds_before": [
+                                "show run | include name-server"
+                            ],
+                            "cmds_after": [
+                                "show run | include name-server"
+                            ]
+                        },
+                        "hosts": [
+                            {
+                                "another-switch": {
+                                    "errors": [],
+                                    "rc": null,
+                                    "message": "skipped",
+                                    "config": {
+                                        "host": "another-switch",
+                                        "settings": {},
+                                        "credentials": false
+                                    }
+                                }
+                            },
+                            {
+                                "some-switch": {
+                                    "errors": [],
+                                    "rc": 0,
+                                    "output": {
+                                        "cmds_before": [
+                                            "ip name-server 8.8.8.8"
+                                        ],
+                                        "cmds_after": [
+                                            "ip name-server 9.9.9.9"
+                                        ]
+                                    },
+                                    "message": "ok",
+                                    "config": {
+                                        "settings": {
+                                            "log_file": "~/.conquers/some-switch.log"
+                                        },
+                                        "credentials": {
+                                            "user": "admin",
+                                            "host": "some-switch",
+                                            "encrypted_pass": "********",
+                                            "pass": "********"
+                                        }
+                                    }
+                                }
+                            }
+                        ]
+                    },
+                    "anothergroup": {
+                        "...": "..."
+                    }
                 }
+            }
+        """
+
+        for group in self.offsets:
+            yield group, self.hosts(group)
+
+    def batches(self, hosts):
+        """
+        Yields lists of up to **REPORT_BATCH** hosts from the iterator
+        **hosts**.
+        """
+
+        batch = []
+
+        for host in hosts:
+            batch.append(host)
+
+            if len(batch) == self.REPORT_BATCH:
+                yield batch
+                batch = []
+
+        if batch:
+            yield batch
+
+    def write_yaml(self, path) -> None:
+        """
+        Writes the yaml report to **path**, **REPORT_BATCH** hosts at a
+        time. The result is the same as dumping the whole report at once,
+        except that ``version`` comes first and groups are sorted by name.
+        """
+
+        def indented(text, indent):
+            return "".join(indent + line for line in text.splitlines(True))
+
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(f"version: {self.REPORT_VERSION}\ngroups:")
+
+            if not self.offsets:
+                fh.write(" {}\n")
+
+            fh.write("\n")
+
+            for group in sorted(self.offsets):
+                fh.write(
+                    indented(
+                        yaml.dump(
+                            {group: {"settings": self.settings(group)}},
+                            Dumper=ReportDumper
+                        ),
+                        "  "
+                    )
+                )
+                fh.write("    hosts:\n")
+
+                for batch in self.batches(self.hosts(group)):
+                    fh.write(
+                        indented(
+                            yaml.dump(batch, Dumper=ReportDumper), "    "
+                        )
+                    )
+
+    def write_json(self, path) -> None:
+        """
+        Writes the json report to **path**, **REPORT_BATCH** hosts at a
+        time. The result is the same as dumping the whole report at once
+        with **json_indentation**.
+        """
+
+        indent = " " * self.json_indentation
+
+        def indented(text, level):
+            return text.replace("\n", "\n" + indent * level)
+
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(
+                f'{{\n{indent}"version": {self.REPORT_VERSION},'
+                f'\n{indent}"groups": {{'
             )
 
+            for i, group in enumerate(self.offsets):
+                fh.write(
+                    f'{"," if i else ""}\n{indent * 2}{json.dumps(group)}: {{'
+                    f'\n{indent * 3}"settings": ' +
+                    indented(
+                        json_dumps(self.settings(group), self.json_indentation),
+                        3
+                    ) +
+                    f',\n{indent * 3}"hosts": ['
+                )
+                host_indent = "\n" + indent * 4
+                first = True
+
+                for batch in self.batches(self.hosts(group)):
+                    fh.write(
+                        ("" if first else ",") + host_indent + ("," + host_indent).join(
+                            indented(json_dumps(host, self.json_indentation), 4)
+                            for host in batch
+                        )
+                    )
+                    first = False
+
+                fh.write(f"\n{indent * 3}]\n{indent * 2}}}")
+
+            fh.write(f"\n{indent}}}\n}}" if self.offsets else "}\n}")
+
+    def write_html(self, path) -> None:
+        """
+        Writes the html report to **path**: the viewer with a compact index
+        of all hosts, the results are written to shards of about
+        **SHARD_BYTES** in a directory of its own next to it, named after
+        :py:attr:`constants.Constants.REPORT_SHARDS`. The viewer loads a
+        shard when a host of it is clicked, so the page opens fast however
+        many hosts there are.
+
+        The index holds per host only its name, status (``o`` ok, ``f``
+        failed, ``s`` skipped) and first error, which the viewer searches
+        and of which it renders only the visible rows:
+
+        .. code-block:: json
+
+            {
+                "version": 2,
+                "shards_dir": "report-shards-k2x8a1qe",
+                "hosts": ["sw1", "sw2", "sw3"],
+                "status": "ofo",
+                "errors": {"1": "Exception: Authentication failed."},
+                "groups": [
+                    ["access", 0, {"device_type": "cisco_ios"}],
+                    ["core", 2, {"device_type": "huawei"}]
+                ],
+                "shards": [0]
+            }
+
+        Groups and shards are given by the position of their first host,
+        groups also by their settings. Results in the shards are
+        ``{host: result}`` as in :py:meth:`hosts`, the viewer adds the
+        settings of the group.
+
+        A shard is a script calling ``conquersShard(number, results)``,
+        which, unlike fetching JSON, also works when the report is opened
+        from disk.
+
+        The report replaces **path** only once it is complete, then the
+        shards of the report it replaced are removed. Runs at the same time
+        never write to or remove the shards of each other.
+        """
+
+        directory = os.path.dirname(path)
+        shard_dir = tempfile.mkdtemp(
+            prefix=f"{Const.REPORT_SHARDS}-",
+            dir=directory
+        )
+        # mkdtemp only allows the owner, like the rest of ~/.conquers.
+        old_shard_dir = self.shard_dir_of(path)
+
+        index = {
+            "version": self.REPORT_VERSION,
+            "shards_dir": os.path.basename(shard_dir),
+            "hosts": [],
+            "status": [],
+            "errors": {},
+            "groups": [],
+            "shards": [0]
+        }
+        shard = []
+        shard_size = 0
+        shard_number = 0
+
+        def write_shard():
+            with open(
+                os.path.join(shard_dir, f"shard-{shard_number:05d}.js"),
+                "w",
+                encoding="utf-8"
+            ) as fh:
+                fh.write(
+                    f"conquersShard({shard_number}, [\n" +
+                    ",\n".join(shard) + "\n]);\n"
+                )
+
+        for group, hosts in self.hosts_by_group():
+            index["groups"].append(
+                [group, len(index["hosts"]), self.settings(group)]
+            )
+
+            for h in hosts:
+                if shard_size >= self.SHARD_BYTES:
+                    write_shard()
+                    shard = []
+                    shard_size = 0
+                    shard_number += 1
+                    index["shards"].append(len(index["hosts"]))
+
+                switch = next(iter(h))
+
+                if h[switch]["errors"]:
+                    index["errors"][len(index["hosts"])] = \
+                        str(h[switch]["errors"][0])[:self.INDEX_ERROR_LENGTH]
+                    index["status"].append("f")
+                elif h[switch]["message"] == "skipped":
+                    index["status"].append("s")
+                else:
+                    index["status"].append("o")
+
+                index["hosts"].append(switch)
+
+                entry = json_dumps(h)
+                shard.append(entry)
+                shard_size += len(entry)
+
+        if shard:
+            write_shard()
+
+        index["status"] = "".join(index["status"])
+
+        temp_file = f"{path}.{os.getpid()}.tmp"
+
+        with open(temp_file, "w", encoding="utf-8") as fh:
+            fh.write(self.htmltop)
+            fh.write(f'\t\t<script type="application/json" id="{self.INDEX_ID}">')
+            # Keeps "</script>" in host names or errors from ending the tag.
+            fh.write(json_dumps(index).replace("<", "\\u003c"))
+            fh.write('</script>\n')
+            fh.write(self.htmlbottom)
+
+        os.replace(temp_file, path)
+
+        if old_shard_dir is not None and old_shard_dir != shard_dir:
+            shutil.rmtree(old_shard_dir, ignore_errors=True)
+
+    def shard_dir_of(self, path) -> str:
+        """
+        Returns the directory with the shards of the html report at
+        **path**, ``None`` if there is no such report.
+        """
+
+        start = f'<script type="application/json" id="{self.INDEX_ID}">'
+
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                text = fh.read()
+        except OSError as e:
+            return None
+
+        begin = text.find(start)
+
+        if begin < 0:
+            return None
+
+        end = text.find("</script>", begin)
+
+        try:
+            index = json_loads(text[begin + len(start):end])
+        except ValueError as e:
+            return None
+
+        # Reports before shards_dir used one directory for all.
+        name = index.get("shards_dir", Const.REPORT_SHARDS)
+
+        # Only ever a directory next to the report.
+        if os.path.basename(name) != name or \
+                not name.startswith(Const.REPORT_SHARDS):
+            return None
+
+        return os.path.join(os.path.dirname(path), name)
+
     def log_to_report(self) -> None:
         """
         Logs a full report if configured in the configuration file.
@@ -198,17 +902,20 @@ class Collector:
             * html (fancy, recommended for humans)
             * yaml
             * json or json:<indentation>
+
+        Reports are written from the spool one host at a time, so memory
+        does not grow with the number of hosts. If more than one is
+        configured, each is written by its own forked worker, see
+        :py:meth:`write_reports`.
         """
 
-        try:
-            report_types = self.collected_objects[0]["config"]["settings"]["report_types"]
-        # report_types is not defined in the configuration -> do nothing.
-        except Exception as e:
-            report_types = ""
+        report_types = self.report_types or ""
+        writers = []
 
         if "yaml" in report_types:
-            with open(f"{Const.CHOME_ABS_PATH}/report.yaml", "w", encoding="utf-8") as fh:
-                fh.write(yaml.dump(self.hosts_by_group))
+            writers.append(
+                (self.write_yaml, f"{Const.CHOME_ABS_PATH}/report.yaml")
+            )
 
         for rep_t in report_types:
             if "json" in rep_t:
@@ -220,43 +927,79 @@ class Collector:
                 except IndexError as e:
                     pass
 
-                with open(f"{Const.CHOME_ABS_PATH}/report.json", "w", encoding="utf-8") as fh:
-                    fh.write(json.dumps(self.hosts_by_group,
-                                        indent=self.json_indentation))
+                writers.append(
+                    (self.write_json, f"{Const.CHOME_ABS_PATH}/report.json")
+                )
 
                 break
 
         if "html" in report_types:
-            with open(f"{Const.CHOME_ABS_PATH}/report.html", "w", encoding="utf-8") as fh:
-                fh.write(self.htmltop)
-
-                for group in self.hosts_by_group:
-                    # fh.write('<li class="group-entry">' + group + 
-                    #     '</li><li class="sub-li"><ul class="hosts-nav-sub">')
-                    fh.write('\t\t\t\t\t\t\t<li class="group-entry">\n')
-                    fh.write('\t\t\t\t\t\t\t\t' + group + '\n')
-                    fh.write('\t\t\t\t\t\t\t</li>\n')
-                    fh.write('\t\t\t\t\t\t\t<li class="sub-li">\n')
-                    fh.write('\t\t\t\t\t\t\t\t<ul class="hosts-nav-sub">\n')
-
-                    for h in self.hosts_by_group[group]:
-                        temp_group = {
-                            group: []
-                        }
-                        temp_group[group].append(h)
-                        # fh.write('<li class="sub-li-item" data-json=\'' +
-                        # json.dumps(temp_group).replace("'", "\'") + 
-                        # '\'>' + next(iter(h)) + '</li>')
-                        fh.write('\t\t\t\t\t\t\t\t\t')
-                        fh.write('<li class="sub-li-item" ')
-                        fh.write('data-json=\'' +
-                            json.dumps(temp_group).replace("'", "\'") + 
-                            '\'>' + next(iter(h)) + '</li>\n')
-
-                    fh.write('\t\t\t\t\t\t\t\t</ul>\n')
-                    fh.write('\t\t\t\t\t\t\t</li>')
-
-                fh.write(self.htmlbottom)
+            writers.append(
+                (self.write_html, f"{Const.CHOME_ABS_PATH}/report.html")
+            )
+
+        self.write_reports(writers)
+
+    def write_reports(self, writers) -> None:
+        """
+        Calls every ``(writer, path)`` of **writers**. The writers only read
+        the spool, so with more than one each runs in a forked child and
+        the reports are written at the same time. A report that cannot be
+        written is shown as error, the others are written anyway.
+        """
+
+        if len(writers) == 1:
+            self.write_report(*writers[0])
+
+            return
+
+        if self.spool is not None:
+            self.spool.flush()
+
+        # Nothing buffered may be printed twice.
+        sys.stdout.flush()
+        sys.stderr.flush()
+        children = {}
+
+        for writer, path in writers:
+            pid = os.fork()
+
+            if pid == 0:
+                rc = 1
+
+                try:
+                    rc = 0 if self.write_report(writer, path) else 1
+                finally:
+                    sys.stdout.flush()
+                    sys.stderr.flush()
+                    os._exit(rc)
+
+            children[pid] = path
+
+        for pid, path in children.items():
+            pid, status = os.waitpid(pid, 0)
+
+            rc = os.waitstatus_to_exitcode(status)
+
+            # Errors are shown by the child, but not if it was killed.
+            if rc < 0:
+                Collector.print_error(
+                    f"[REPORT] Cannot write {path}: killed by signal {-rc}"
+                )
+
+    def write_report(self, writer, path) -> bool:
+        """
+        Calls **writer** with **path** and shows an error if the report
+        cannot be written. Returns ``True`` if it was written.
+        """
+
+        try:
+            writer(path)
+        except Exception as e:
+            Collector.print_error(f"[REPORT] Cannot write {path}: {e}")
+            return False
+
+        return True
 
     def log_to_file(self, data) -> None:
         """
@@ -292,10 +1035,11 @@ class Collector:
             data : dict
         """
 
-        if "credentials" in data["config"]:
+        if data["config"].get("credentials"):
+            data["config"].pop("host", None)
+            data["config"]["credentials"]["encrypted_pass"] = "********"
+
             if "pass" in data["config"]["credentials"]:
-                data["config"].pop("host", None)
-                data["config"]["credentials"]["encrypted_pass"] = "********"
                 data["config"]["credentials"]["pass"] = "********"
 
     def print_single_summary(self, data) -> None:
@@ -303,6 +1047,9 @@ class Collector:
         Print collected info in yaml format to the console. 
         This can be silenced by setting **silent** to **true** in the
         configuration.
+
+        While :py:attr:`output` runs, the summary is rendered and printed
+        on its thread.
         """
 
         # Do not print if silent.
@@ -310,12 +1057,22 @@ class Collector:
             if data["config"]["settings"]["silent"]:
                 return
 
-        yaml_data = yaml.dump(data)
+        if Collector.output is None:
+            self.render_single_summary(data)
+        else:
+            Collector.output.call(self.render_single_summary, (data,))
+
+    def render_single_summary(self, data) -> None:
+        """
+        Prints **data** in yaml format, see :py:meth:`print_single_summary`.
+        """
+
+        yaml_data = yaml.dump(data, Dumper=ReportDumper)
 
         for line in yaml_data.splitlines():
             Collector.print_extra_info(f"    {line}")
 
-    def __format_line_summary(self, group, host, *strings) -> str:
+    def __format_line_summary(self, group, host, *strings, timings=()) -> str:
         g_max_len = 18
         max_len = 13
         result = ""
@@ -335,6 +1092,26 @@ class Collector:
 
             result += "{:<15}".format(v)
 
+        for t in timings:
+            result += "{:>9}".format(t)
+
+        return result
+
+    @staticmethod
+    def format_timings(timings) -> list:
+        """
+        Returns the durations shown in the summary, in seconds with two
+        decimals, ``-`` if a phase was not reached.
+        """
+
+        result = []
+
+        for key in Collector.TIMING_COLUMNS.values():
+            if timings.get(key) is None:
+                result.append("-")
+            else:
+                result.append("{:.2f}".format(timings[key]))
+
         return result
 
     def print_complete_summary(self) -> None:
@@ -342,57 +1119,116 @@ class Collector:
         Print brief information about completed hosts in a table.
         """
 
-        self.__build_complete_summary()
         print("\n\n")
         Collector.print_info(
             self.__format_line_summary(
-                "Group", "Host", "Device", "Msg", "Err", "Log"
+                "Group", "Host", "Device", "Msg", "Err", "Log",
+                timings=Collector.TIMING_COLUMNS
             )
         )
-        for i in range(0,90):
+        for i in range(0, 90 + 9 * len(Collector.TIMING_COLUMNS)):
             Collector.print_info("-", end="")
         print("")
 
-        for g in self.hosts_by_group:
-            for h in self.hosts_by_group[g]:
+        for g, hosts in self.hosts_by_group():
+            for h in hosts:
                 switch = next(iter(h))
                 errors = len(h[switch]["errors"])
                 message = h[switch]["message"]
-                device = h[switch]["config"]["settings"]["device_type"]
-                if "log_file" in h[switch]["config"]["settings"]:
+                settings = self.host_settings(g, h[switch])
+                device = settings["device_type"]
+                if "log_file" in settings:
                     log = "yes"
                 else:
                     log = "no"
 
+                timings = self.format_timings(h[switch].get("timings", {}))
+
                 if errors > 0:
                     errors = str(errors)
                     Collector.print_error(
                         self.__format_line_summary(
-                            g, switch, device, message, errors, log
+                            g, switch, device, message, errors, log,
+                            timings=timings
                         )
                     )
                 elif message == "skipped":
                     errors = str(errors)
                     Collector.print_warning(
                         self.__format_line_summary(
-                            g, switch, device, message, errors, log
+                            g, switch, device, message, errors, log,
+                            timings=timings
                         )
                     )
                 else:
                     errors = str(errors)
                     Collector.print_mild_info(
                         self.__format_line_summary(
-                            g, switch, device, message, errors, log
+                            g, switch, device, message, errors, log,
+                            timings=timings
                         )
                     )
 
+    @staticmethod
+    def start_output(maxsize=OUTPUT_QUEUE_SIZE) -> None:
+        """
+        Starts :py:attr:`output`, from now on the console is written by
+        its thread.
+        """
+
+        Collector.output = ConsoleOutput(maxsize)
+        Collector.output.start()
+
+    @staticmethod
+    def stop_output() -> None:
+        """
+        Waits until :py:attr:`output` printed everything and stops it.
+        """
+
+        output = Collector.output
+
+        if output is None:
+            return
+
+        output.stop()
+        Collector.output = None
+
+    @staticmethod
+    def write(string, **kwargs) -> None:
+        """
+        Prints **string**, through :py:attr:`output` if it runs.
+        """
+
+        if Collector.output is None:
+            print(string, **kwargs)
+        else:
+            Collector.output.call(
+                Collector.output.print, (string,), kwargs
+            )
+
+    @staticmethod
+    def print_now(string, color=Fore.MAGENTA) -> None:
+        """
+        Writes **string** to stderr right away, past :py:attr:`output` and
+        without taking any lock, so it is safe in a signal handler that
+        interrupted a print.
+        """
+
+        if os.isatty(2):
+            string = f"{Style.NORMAL}{color}{string}{Style.RESET_ALL}"
+
+        try:
+            os.write(2, f"{string}\n".encode(errors="replace"))
+        except OSError:
+            pass
+
     @staticmethod
     def print_info(string, **kwargs) -> None:
         """
         Print to console in bright green.
         """
 
-        print(f"{Style.BRIGHT}{Fore.GREEN}{string}", **kwargs)
+        Collector.write(f"{Style.BRIGHT}{Fore.GREEN}{string}", **kwargs)
 
     @staticmethod
     def print_mild_info(string, **kwargs) -> None:
@@ -400,7 +1236,7 @@ class Collector:
         Print to console in normal green.
         """
 
-        print(f"{Style.NORMAL}{Fore.GREEN}{string}", **kwargs)
+        Collector.write(f"{Style.NORMAL}{Fore.GREEN}{string}", **kwargs)
 
     @staticmethod
     def print_error(string, **kwargs) -> None:
@@ -408,7 +1244,7 @@ class Collector:
         Print error to console in red.
         """
 
-        print(f"{Style.NORMAL}{Fore.RED}{string}", **kwargs)
+        Collector.write(f"{Style.NORMAL}{Fore.RED}{string}", **kwargs)
 
     @staticmethod
     def print_warning(string, **kwargs) -> None:
@@ -416,7 +1252,7 @@ class Collector:
         Print a warning to console in purple.
         """
 
-        print(f"{Style.NORMAL}{Fore.MAGENTA}{string}", **kwargs)
+        Collector.write(f"{Style.NORMAL}{Fore.MAGENTA}{string}", **kwargs)
 
     @staticmethod
     def print_extra_info(string, **kwargs) -> None:
@@ -424,4 +1260,4 @@ class Collector:
         Prints additional information in grey.
         """
 
-        print(f"{Style.NORMAL}{Fore.LIGHTBLACK_EX}{string}", **kwargs)
+        Collector.write(f"{Style.NORMAL}{Fore.LIGHTBLACK_EX}{string}", **kwargs)
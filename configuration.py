@@ -1,14 +1,28 @@
 import os
 import tomllib
+import pickle
+import hashlib
 from pathlib import Path
 import yaml
+# Use libyaml's C loader if PyYAML was built with it.
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+# conquers libraries
+from constants import Constants as Const
 
 class Config:
     """
     This class parses **conquers**'s configuration file, checks for errors and
     returns an object containing the configuration.
 
-    The path to a yaml configuration file must be passed to the constructor.
+    The path to a yaml or toml configuration file must be passed to the
+    constructor.
+
+    Parsed configurations are cached in ``~/.conquers/cache``, keyed by the
+    path, modification time and size of the file, so repeated runs against
+    an unchanged configuration skip parsing entirely.
 
     Attributes:
         config_file (str): A relative or absolute path to the yaml configuration file.
@@ -20,15 +34,18 @@ class Config:
         errors (list): Errors are collected here.
         required_keys (list): A list of keys that must be present \
                 in the configuration per group or host.
+        use_cache (bool): Whether to use the cache of parsed configurations.
+                Disabled with ``--no-config-cache``.
 
     """
 
-    def __init__(self, config_file) -> None:
+    def __init__(self, config_file, use_cache=True) -> None:
         self.file_handle = None
         self.file_extension = None
         self.config_file = config_file
         self.config_object = None
-        self.valid_file_extensions = [".yaml", ".yml"]
+        self.use_cache = use_cache
+        self.valid_file_extensions = [".yaml", ".yml", ".toml"]
         self.errors = []
         self.required_keys = [
             "device_type",
@@ -62,25 +79,147 @@ class Config:
         into :py:class:`~configuration.Config.config_object`.
         Returns ``True`` if successful, ``False`` otherwise.
 
-        Todo:
-            * either remove ``.toml`` or implement it
+        A cached result is used if the file did not change since it was
+        cached.
         """
 
+        if self.use_cache:
+            self.config_object = self.load_cache()
+
+            if self.config_object is not None:
+                return True
+
         try:
             if self.file_extension == ".toml":
                 f = open(self.config_file, "rb")
                 self.config_object = tomllib.load(f)
             else:
                 f = open(self.config_file, "r")
-                self.config_object = yaml.safe_load(f)
+                self.config_object = yaml.load(f, Loader=SafeLoader)
 
             f.close()
         except Exception as e:
             self.errors.append(e)
             return False
 
+        if self.use_cache:
+            self.save_cache()
+
         return True
 
+    def cache_key(self) -> tuple:
+        """
+        Returns ``(path, modification time, size)`` of
+        :py:class:`~configuration.Config.config_file`.
+        """
+
+        path = os.path.abspath(self.config_file)
+        stat = os.stat(path)
+
+        return (path, stat.st_mtime_ns, stat.st_size)
+
+    def cache_file(self) -> Path:
+        """
+        Returns the path of the cache file for
+        :py:class:`~configuration.Config.config_file`.
+        """
+
+        if Const.CHOME_ABS_PATH is None:
+            Const.set_abs_path()
+
+        name = hashlib.sha256(
+            os.path.abspath(self.config_file).encode()
+        ).hexdigest()
+
+        return Path(Const.CHOME_ABS_PATH) / "cache" / f"config-{name}.pickle"
+
+    def load_cache(self) -> dict:
+        """
+        Returns the cached configuration if it is still valid, ``None``
+        otherwise.
+        """
+
+        try:
+            with open(self.cache_file(), "rb") as fh:
+                key, config_object = pickle.load(fh)
+        except Exception:
+            return None
+
+        try:
+            if key != self.cache_key():
+                return None
+        except OSError:
+            return None
+
+        return config_object
+
+    def save_cache(self) -> None:
+        """
+        Caches :py:class:`~configuration.Config.config_object`. The cache is
+        only an optimization, failing to write it is not an error.
+        """
+
+        cache_file = self.cache_file()
+        temp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+
+            with open(temp_file, "wb") as fh:
+                pickle.dump(
+                    (self.cache_key(), self.config_object),
+                    fh,
+                    protocol=pickle.HIGHEST_PROTOCOL
+                )
+
+            # Readers never see a half written file.
+            os.replace(temp_file, cache_file)
+        except Exception:
+            if temp_file.exists():
+                temp_file.unlink()
+
+    def check_limits(self) -> bool:
+        """
+        Checks that ``max_sessions`` in ``defaults`` is a number above 0 or
+        null and that ``forks`` is a number above 0 wherever it is set,
+        otherwise no host would ever get a slot and the run would wait
+        forever.
+        Returns ``True`` if successful, ``False`` otherwise.
+        """
+
+        if not isinstance(self.config_object, dict):
+            return True
+
+        defaults = self.config_object.get("defaults") or {}
+        max_sessions = defaults.get("max_sessions")
+
+        if max_sessions is not None and not self.is_positive_int(max_sessions):
+            self.errors.append(
+                "max_sessions in defaults must be a number above 0 or " +
+                f"null, not {max_sessions!r}."
+            )
+
+        for group, settings in self.config_object.items():
+            if not isinstance(settings, dict) or "forks" not in settings:
+                continue
+
+            if not self.is_positive_int(settings["forks"]):
+                self.errors.append(
+                    f"forks in {group} must be a number above 0, " +
+                    f"not {settings['forks']!r}."
+                )
+
+        return not self.errors
+
+    @staticmethod
+    def is_positive_int(value) -> bool:
+        """
+        Returns ``True`` if **value** is an integer above 0.
+        """
+
+        return isinstance(value, int) and not isinstance(value, bool) and \
+            value > 0
+
     def check_required_keys(self) -> bool:
         """
         Todo:
@@ -2,15 +2,13 @@
 
 import sys
 import os
-import math
 import argparse
-import socket
-import json
-from copy import deepcopy
-from inspect import currentframe, getframeinfo
+import itertools
+from collections import ChainMap
 from pathlib import Path
 import signal
 import psutil
+from colorama import Fore
 # conquers libraries
 import utilities as util
 from credentials import\
@@ -18,13 +16,23 @@ from credentials import\
         MasterkeyError,\
         CredentialsError
 from configuration import Config
-from switch import\
-        CsSwitch,\
-        CsSwitchError
 from constants import Constants
 from collector import\
         Collector,\
         CollectorError
+from engines import\
+        ENGINES,\
+        EngineError
+from scheduler import Scheduler
+from profiling import Profiler
+from metrics import RunMetrics
+from resolver import Resolver
+from daemon import\
+        Daemon,\
+        DaemonError
+from inventory import\
+        load_inventory,\
+        InventoryError
 
 # Set CHOME_ABS_PATH
 Constants.set_abs_path()
@@ -36,10 +44,6 @@ if not os.path.exists(Constants.CHOME_ABS_PATH):
 if not Path(f"{Constants.CHOME_ABS_PATH}/credentials").is_file():
     Path(f"{Constants.CHOME_ABS_PATH}/credentials").touch()
 
-# Remove socket file if it still exists.
-if os.path.exists(Constants.SOCKET_FILE):
-    os.remove(Constants.SOCKET_FILE)
-
 def main():
     """
     Todo:
@@ -53,6 +57,13 @@ def main():
     parser = argparse.ArgumentParser(description=f"{Constants.VERSION}")
     args = parse_options(parser)
 
+    # Profile the whole run.
+    profiler = None
+
+    if args.profile is not None:
+        profiler = Profiler(args.profile, trace_memory=args.profile_memory)
+        profiler.start()
+
     ####################################################### 
     # Use utilities?                                      #
     ####################################################### 
@@ -73,6 +84,23 @@ def main():
         add_cred = Credentials(args.credentials, args.masterkey)
         add_cred.checks_add_entry()
         sys.exit(0)
+
+    # Keep sessions open for runs with --engine daemon.
+    if args.daemon:
+        try:
+            daemon = Daemon(
+                f"{Constants.CHOME_ABS_PATH}/{Constants.DAEMON_SOCKET}",
+                Credentials(args.credentials, args.masterkey).master_key,
+                pool_size=args.pool_size,
+                idle_timeout=args.idle_timeout
+            )
+            daemon.serve()
+        except (MasterkeyError, CredentialsError, DaemonError) as e:
+            Collector.print_error(e)
+            sys.exit(1)
+
+        sys.exit(0)
+
     # Parse configuration from file.
     config = get_configuration(args)
 
@@ -80,233 +108,194 @@ def main():
         parser.print_help(sys.stderr)
         sys.exit(1)
 
-    # Get Masterkey if not privided.
-    if args.masterkey is None:
-        try:
-            args.masterkey = Credentials(args.credentials, None).master_key.decode()
-        except MasterkeyError as e:
-            print(e)
-            sys.exit(1)
+    # Get Masterkey if not privided and read the credentials file once.
+    try:
+        credentials = Credentials(args.credentials, args.masterkey)
+        credentials.load_index()
+    except (MasterkeyError, CredentialsError) as e:
+        print(e)
+        sys.exit(1)
 
     # Create config objects for every switch.
-    cs_config_objs = gen_switch_config_objects(config)
-
-    for group in cs_config_objs:
-        for h in group["hosts"]:
-            try:
-                h['credentials'] = Credentials(
-                    args.credentials,
-                    args.masterkey
-                ).return_credentials(h['host'])
-            except CredentialsError as e:
-                print(e)
-                sys.exit(1)
-
-    # UNIX SOCKET listen.
-    s_listen = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-    s_listen.bind(Constants.SOCKET_FILE)
-    s_listen.listen(0)
+    try:
+        cs_config_objs = gen_switch_config_objects(config)
+    except InventoryError as e:
+        Collector.print_error(e)
+        sys.exit(1)
+
+    # Only resolve which entry applies, the workers decrypt.
+    def prepare(h):
+        h['credentials'] = credentials.return_credentials(
+            h['host'],
+            decrypt=False
+        )
+
+        # Coalesced occurrences are the same switch, reached the same way.
+        for c in h.get('coalesced', []):
+            c['host']['credentials'] = h['credentials'] and \
+                dict(h['credentials'])
+
+            for key in ('ip', 'resolve_error'):
+                if key in h:
+                    c['host'][key] = h[key]
+
+    # Resolve host names ahead of the scheduler.
+    ttl = config["defaults"].get("dns_ttl", 300)
+    resolver = Resolver(
+        None if args.no_dns_cache else \
+            f"{Constants.CHOME_ABS_PATH}/{Constants.DNS_CACHE}",
+        ttl=ttl
+    )
+    resolver.load()
+
+    for obj in cs_config_objs:
+        obj["hosts"] = resolver.stream(obj["hosts"])
 
     coll = Collector()
 
+    try:
+        coll.open_spool()
+    except CollectorError as e:
+        Collector.print_error(e)
+        sys.exit(1)
+
+    # Settings shared by a group are reported once.
+    for obj in cs_config_objs:
+        coll.add_group(obj["group"], obj["settings"])
+
+    # Run-wide ceiling of hosts in flight.
+    max_sessions = config["defaults"].get("max_sessions", None)
+
+    # Run all groups at once or one after another.
+    if args.concurrent_groups:
+        schedulers = [Scheduler(cs_config_objs, max_sessions, prepare)]
+    else:
+        schedulers = [
+            Scheduler([obj], max_sessions, prepare) for obj in cs_config_objs
+        ]
+
+    engine = ENGINES[args.engine](
+        coll,
+        max_workers=max([s.capacity for s in schedulers], default=1),
+        show_group=args.concurrent_groups,
+        master_key=credentials.master_key,
+        profile_dir=None if profiler is None else profiler.directory
+    )
+
+    if profiler is not None:
+        engine.observers.append(profiler.sample)
+
+    metrics = None
+
+    if args.metrics is not None:
+        metrics = RunMetrics()
+        engine.observers.append(metrics.observe)
+
     #########################################################
     # Let's start forking.                                  #
     #########################################################
-    for obj in cs_config_objs:
-        Collector.print_info(
-            f'[GROUP] {obj["group"]}, forks: {obj["forks"]}'
-        )
+    # The console is written by a thread of its own while hosts run.
+    Collector.start_output()
+    engine.start()
+
+    try:
+        for scheduler in schedulers:
+            for obj in scheduler.groups:
+                Collector.print_info(
+                    f'[GROUP] {obj["group"]}, forks: {obj["forks"]}'
+                )
+
+            engine.run(scheduler)
+    except EngineError as e:
+        Collector.print_error(e)
+        sys.exit(1)
+    finally:
+        engine.stop()
+        Collector.stop_output()
+        resolver.close()
+        resolver.save()
 
-        # Determine fork_rounds.
-        fork_rounds = math.ceil(len(obj["hosts"]) / obj["forks"])
-        forks = obj["forks"]
-
-        for i in range(0, fork_rounds):
-            pids = []
-            for host in obj["hosts"][(i*forks):(i*forks)+forks]:
-                Collector.print_mild_info(f'   *    {host["host"]}')
-
-                if host["credentials"] is False:
-                    Collector.print_warning(
-                        f'   ✝    {host["host"]} No credentials found, skipping ...'
-                    )
-
-                    coll.add_to_collection({
-                        "group": obj["group"],
-                        "host": host["host"],
-                        "errors": [],
-                        "rc": None,
-                        "message": "skipped",
-                        "config": host
-                    })
-
-                    continue
-
-                pid = os.fork()
-
-                if pid == 0:
-                    # Define output structure per forked host.
-                    output_object = {
-                        "group": obj["group"],
-                        "host": host["host"],
-                        "errors": [],
-                        "rc": 0,
-                        "output": {
-                            "cmds_before": [],
-                            "cmds_after": [],
-                            "conf_cmds": []
-                        },
-                        "message": "",
-                        # Add config for host.
-                        "config": host
-                    }
-                    # UNIX SOCKET
-                    s_conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-
-                    try:
-                        csswitch = CsSwitch(host)
-                    except CsSwitchError as e:
-                        frameinfo = getframeinfo(currentframe())
-                        socket_send_info(s_conn, output_object, frameinfo, e)
-                        sys.exit(1)
-
-                    # Send BEFORE commands.
-                    try:
-                        output = csswitch.send_cmds_ba("before")
-                        for line in output.splitlines():
-                            output_object["output"]["cmds_before"].append(line)
-                    except CsSwitchError as e:
-                        frameinfo = getframeinfo(currentframe())
-                        socket_send_info(s_conn, output_object, frameinfo, e)
-                        sys.exit(1)
-
-                    # Send CONFIG commands.
-                    try:
-                        output = csswitch.send_conf_cmds()
-                        for line in output.splitlines():
-                            output_object["output"]["conf_cmds"].append(line)
-                    except CsSwitchError as e:
-                        frameinfo = getframeinfo(currentframe())
-                        socket_send_info(s_conn, output_object, frameinfo, e)
-                        sys.exit(1)
-
-                    # Send AFTER commands.
-                    try:
-                        output = csswitch.send_cmds_ba("after")
-                        for line in output.splitlines():
-                            output_object["output"]["cmds_after"].append(line)
-                    except CsSwitchError as e:
-                        frameinfo = getframeinfo(currentframe())
-                        socket_send_info(s_conn, output_object, frameinfo, e)
-                        sys.exit(1)
-
-                    output_object["message"] = "ok"
-                    socket_send_info(s_conn, output_object)
-                    sys.exit(0)             # exit forked process
-                else:
-                    pids.append(pid)
-                    os.waitpid(pid, 1)
-
-            #######################################################
-            # Wait for pids.                                      #
-            #######################################################
-            for pid in pids:
-                conn, addr = s_listen.accept()
-                data = ""
-                data_json = {}
-
-                while True:
-                    data_bin = conn.recv(Constants.BUFF_SIZE)
-                    if data_bin == b"":
-                        break
-                    data += data_bin.decode()
-
-                try:
-                    data_json = json.loads(data)
-                except json.decoder.JSONDecodeError as e:
-                    Collector.print_error(f'   ⨯    {data_json["host"]}')
-                    Collector.print_error(f"         {e}")
-                    sys.exit(1)
-
-                if data_json["errors"]:
-                    Collector.print_error(f'   ⨯    {data_json["host"]}')
-                    Collector.print_error(f'        {data_json["errors"][0]}')
-                else:
-                    Collector.print_info(f'   ✓    {data_json["host"]}')
-
-                # If log_file is defined, log output.
-                try:
-                    coll.log_to_file(data_json)
-                except CollectorError as e:
-                    coll.print_warning(f'   !    {e}')
-                # Hide passwords in console output.
-                coll.hide_passwords(data_json)
-                # The single summary can be silenced in the configuration with
-                # silent: true
-                coll.print_single_summary(data_json)
-                # -------------------------------------------------------
-                coll.add_to_collection(data_json)
-                # -------------------------------------------------------
-                os.waitpid(pid, 0)
-            # ---- for pid in pids END ------------------------------
-    # ---- for obj in cs_config_objs END --------------------
-
-    s_listen.close()
-    # Clean up remote socket file.
-    if os.path.exists(Constants.SOCKET_FILE):
-        os.remove(Constants.SOCKET_FILE)
     ########################################################
     # print collected data from UNIX SOCKET nicely         #
     # and in color :)                                      #
     ########################################################
     coll.print_complete_summary()
     coll.log_to_report()
+
+    try:
+        coll.close()
+    except CollectorError as e:
+        Collector.print_error(e)
+
+    if metrics is not None:
+        metrics.finish(schedulers)
+
+        try:
+            metrics.write(args.metrics)
+        except OSError as e:
+            Collector.print_error(f"Cannot write metrics: {e}")
+
+    if profiler is not None:
+        profiler.stop()
+        Collector.print_info(f"Profile written to {profiler.directory}")
 # ---- main() END --------------------------------------------------------------
 
 def catch_and_cleanup(signum, frame):
     """
     Kill all forked processes and exit.
+
+    Prints past the output thread: the interrupted code may hold the lock
+    of its queue. The thread prints what is queued and stops when main
+    unwinds.
     """
 
     parent = psutil.Process()
     children = parent.children(recursive=True)
 
     for child in children:
-        killed = True
-        Collector.print_warning(f"Child pid {child.pid} ", end="")
         c = psutil.Process(child.pid)
 
         try:
             c.terminate()
         except Exception as e:
-            Collector.print_error(f"! Cannot kill {child.pid}.")
-            killed = False
+            Collector.print_now(f"! Cannot kill {child.pid}.", Fore.RED)
+            continue
 
-        if killed:
-            Collector.print_info("[KILLED]")
+        Collector.print_now(f"Child pid {child.pid} [KILLED]")
 
     sys.exit(0)
 
-def socket_send_info(sock, output_object, frameinfo=None, exception=None):
+def positive_int(value) -> int:
     """
-    Todo:
-        * description
+    ``type`` of options that must be a whole number above zero.
     """
 
-    if exception is not None:
-        output_object["errors"].append(
-            # f"Exception: {exception} ({__file__}:{frameinfo.lineno})"
-            f"Exception: {exception}"
-        )
-        output_object["message"] = "failed"
-        output_object["rc"] = 1
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a number above 0")
+
+    return number
+
+def non_negative_int(value) -> int:
+    """
+    ``type`` of options that must be a whole number of zero or above.
+    """
 
-    output_object = json.dumps(output_object)
+    try:
+        number = int(value)
+    except ValueError:
+        number = -1
 
-    sock.connect(Constants.SOCKET_FILE)
-    sock.sendall(output_object.encode())
-    sock.close()
-# ---- socket_send_info() END --------------------------------------------------
+    if number < 0:
+        raise argparse.ArgumentTypeError(
+            f"{value} is not a number of 0 or above"
+        )
+
+    return number
 
 def parse_options(parser):
     """
@@ -327,6 +316,16 @@ def parse_options(parser):
                         help=f"""Path to configuration file. Default is
                         {Constants.CHOME}{Constants.DEFAULT_CONFIG}""",
                         required=False)
+    parser.add_argument("--no-config-cache",
+                        action="store_true",
+                        help=f"""Always parse the configuration file instead
+                        of using the cached result in
+                        {Constants.CHOME}cache""")
+    parser.add_argument("--no-dns-cache",
+                        action="store_true",
+                        help=f"""Resolve all host names instead of using
+                        the cached addresses in
+                        {Constants.CHOME}{Constants.DNS_CACHE}""")
     parser.add_argument("-m",
                         "--masterkey",help="""Path to file containing the
                         master key""".replace("\n", " "), required=False)
@@ -340,6 +339,54 @@ def parse_options(parser):
                         default=None,
                         required=False
                        )
+    parser.add_argument("--engine",
+                        choices=list(ENGINES),
+                        default="fork",
+                        help="""How hosts are run: one forked process per
+                        host (fork), a reusable process pool (process-pool),
+                        a thread pool (threads), an asyncio event loop
+                        (asyncio) or a running session daemon (daemon).
+                        Default is fork.""")
+    parser.add_argument("--daemon",
+                        action="store_true",
+                        help=f"""Run as session daemon: keep the sessions to
+                        the switches open and serve runs with --engine daemon
+                        on {Constants.CHOME}{Constants.DAEMON_SOCKET}""")
+    parser.add_argument("--pool-size",
+                        type=non_negative_int,
+                        default=100,
+                        help="""Maximum number of idle sessions the daemon
+                        keeps, the least recently used are closed first.
+                        0 closes every session after its job.
+                        Default is 100.""")
+    parser.add_argument("--idle-timeout",
+                        type=positive_int,
+                        default=300,
+                        help="""Seconds after which the daemon closes an
+                        idle session. Default is 300.""")
+    parser.add_argument("--metrics",
+                        metavar="DIR",
+                        default=None,
+                        help="""Write metrics of the run to DIR, as
+                        OpenMetrics text file (conquers.prom) for node
+                        exporter's textfile collector and as JSON
+                        (metrics.json).""")
+    parser.add_argument("--profile",
+                        metavar="DIR",
+                        default=None,
+                        help="""Write cProfile stats of the parent, of every
+                        host and an aggregate of all to DIR.""")
+    parser.add_argument("--profile-memory",
+                        action="store_true",
+                        help="""With --profile, also trace the memory of the
+                        parent and write tracemalloc snapshots of the start,
+                        the peak and the end of the run.""")
+    parser.add_argument("--concurrent-groups",
+                        action="store_true",
+                        help="""Run all groups at the same time instead of
+                        one after another. Each group keeps its own forks
+                        limit, max_sessions in defaults limits the whole
+                        run.""")
 
     return parser.parse_args()
 # ---- parse_options() END ---------------------------------------------------
@@ -349,9 +396,9 @@ def get_configuration(args):
     Todo:
         * description
     """
-    chkconfig = Config(args.config)
-    chkconfig.check()
-    chkconfig.parse()
+    chkconfig = Config(args.config, use_cache=not args.no_config_cache)
+    if chkconfig.check() and chkconfig.parse():
+        chkconfig.check_limits()
 
     if not chkconfig.errors:
         return chkconfig.return_config()
@@ -363,87 +410,117 @@ def get_configuration(args):
 
 def gen_switch_config_objects(config):
     """
-    Todo:
-        * description
+    Creates a list of group objects from the configuration, each holding
+    the group name, its ``forks``, its ``settings`` and its hosts.
+
+    Settings are layered instead of copied: the settings of a host are a
+    `ChainMap <https://docs.python.org/3/library/collections.html#collections.ChainMap>`_
+    of its own overrides, the group's settings and the defaults. Defaults
+    and group settings are stored once and shared by all hosts, hosts
+    without overrides even share the group's ChainMap. Memory thus grows
+    with the number of overrides rather than with hosts times the size of
+    the settings.
+
+    Hosts of a group's ``inventory`` (see :py:mod:`inventory`) follow the
+    hosts listed under ``hosts`` and are only read when the scheduler asks
+    for them, so ``hosts`` of a group object is an iterator, not a list.
+
+    A switch listed under ``hosts`` of several groups with the same
+    ``port`` and ``device_type`` is only run once, with its first
+    occurrence. The later ones are appended to ``coalesced`` of the first
+    host object as ``{"group": ..., "host": ...}`` and their commands are
+    sent over the same session (see :py:func:`engines.run_host`). Hosts of
+    inventories are never coalesced, that would mean reading them all up
+    front.
     """
 
-    objects = []
     groups = []
-    exclude = ['forks']
+    # Settings that belong to the group or the whole run, not to a host.
+    exclude = ['forks', 'max_sessions', 'dns_ttl']
+
+    def without(settings, keys):
+        # Only copy if there is something to remove.
+        if not any(k in settings for k in keys):
+            return settings
+
+        return {k: v for k, v in settings.items() if k not in keys}
+
+    def host_object(switch, overrides, group_settings):
+        # set or override group settings
+        if overrides:
+            settings = group_settings.new_child(without(overrides, exclude))
+        else:
+            settings = group_settings
+
+        return {
+            "host": switch,
+            "settings": settings
+        }
+
+    def inventory_hosts(inventory, group_settings):
+        # Bound per group, the hosts are read after the loop is done.
+        for switch, overrides in inventory.hosts():
+            yield host_object(switch, overrides, group_settings)
+
+    defaults = without(config['defaults'], exclude + ['inventory'])
+    # First host object per switch, port and device type.
+    seen = {}
 
     for group in config:
-        # set top defaults
-        defaults_top = deepcopy(config['defaults'])
         # skip defaults, it's not a group
         if group == "defaults":
             continue
 
-        group_defaults = deepcopy(defaults_top)
+        group_settings = ChainMap(
+            without(config[group], exclude + ['hosts', 'inventory']),
+            defaults
+        )
+        objects = []
 
-        for default_val in config[group]:
-            # skip hosts
-            if default_val == "hosts":
+        for obj in config[group].get("hosts") or []:
+            switch = next(iter(obj))
+            host = host_object(switch, obj[switch], group_settings)
+            key = (
+                switch,
+                host["settings"].get("port", 22),
+                host["settings"].get("device_type")
+            )
+
+            # Run it with the first occurrence of the switch.
+            if key in seen:
+                seen[key].setdefault("coalesced", []).append(
+                    {
+                        "group": group,
+                        "host": host
+                    }
+                )
                 continue
 
-            # set setting or override defaults
-            group_defaults[default_val] = deepcopy(config[group][default_val])
+            seen[key] = host
+            # add object
+            objects.append(host)
+        # ---- for obj in hosts END ---------
 
-        for key in config[group]:
-            if key != "hosts":
-                continue
+        # Stream the inventory after the listed hosts.
+        if config[group].get("inventory") is not None:
+            inventory = load_inventory(config[group]["inventory"])
+            hosts = itertools.chain(
+                objects, inventory_hosts(inventory, group_settings)
+            )
+        else:
+            hosts = iter(objects)
 
-            settings = {}
-            for obj in config[group][key]:
-                switch = next(iter(obj))
-                settings[switch] = deepcopy(group_defaults)
-
-                # remove excludes
-                for e in exclude:
-                    settings[switch].pop(e, None)
-
-                if obj[switch] is None:
-                    # add object
-                    objects.append(
-                        {
-                            "host": switch,
-                            "settings": settings[switch]
-                        }
-                    )
-                    # has no keys -> continue
-                    continue
-
-                # set or override defaults
-                for attrib_key, attrib_val in obj[switch].items():
-                    # skip excludes
-                    if attrib_key in exclude:
-                        continue
-
-                    settings[switch][attrib_key] = attrib_val
-
-                    # remove excludes
-                    for e in exclude:
-                        settings[switch].pop(e, None)
-
-                # add object
-                objects.append(
-                    {
-                        "host": switch,
-                        "settings": settings[switch]
-                    }
-                )
-                # ---- for attrib_key END ----------
-            # ---- for ob in config END---------
-        # ---- for key in config[group] END
+        forks = config[group].get("forks")
 
         groups.append(
             {
                 "group": group,
-                "forks": group_defaults["forks"] if \
-                    group_defaults["forks"] is not None else defaults_top["forks"],
-                "hosts": objects
+                "forks": forks if forks is not None else \
+                    config['defaults']['forks'],
+                "settings": group_settings,
+                "hosts": hosts
             }
         )
-        objects = []
 
     # ---- for group in config END -----
 
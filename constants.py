@@ -5,14 +5,19 @@ class Constants:
     CHOME = "~/.conquers/"
     CHOME_ABS_PATH = None
     DEFAULT_CONFIG = "config.yaml"
-    SOCKET_FILE = "/tmp/conquers.socket"
+    DNS_CACHE = "dns_cache.json"
+    DAEMON_SOCKET = "daemon.socket"
+    REPORT_SPOOL = "report.jsonl"
+    REPORT_SHARDS = "report-shards"
     """
-    UNIX socket for IPC.
+    Prefix of the directory next to ``report.html`` holding the results of
+    the html report, every report has one of its own, see
+    :py:meth:`collector.Collector.write_html`. The viewer in
+    :py:attr:`HTML_BOTTOM` loads them from the one its index names.
     """
-    BUFF_SIZE = 1024
+    BUFF_SIZE = 65536
     """
-    Buffer size for reading from
-    :py:class:`~constants.Constants.SOCKET_FILE`.
+    Maximum number of bytes read at once from the connection of a child.
     """
     HTML_TOP = '''<!doctype html>
 <html lang="en">
@@ -158,6 +163,11 @@ ul.links li span {
   width: 300px;
   white-space: nowrap;
   background: #343131;
+  display: flex;
+  flex-direction: column;
+}
+.hosts-nav-content > * {
+  flex-shrink: 0;
 }
 
 .hosts-nav-content, .host-content {
@@ -220,6 +230,58 @@ ul.hosts-nav-sub li:hover, ul.hosts-nav-sub li:focus, ul.hosts-nav-sub li:active
   background: #d6d6d6;
 }
 
+/*
+ * Only the visible rows of the host list exist, see class HostList.
+ */
+.hosts-list {
+  flex: 1 1 auto !important;
+  min-height: 102px;
+  overflow-y: auto;
+}
+.hosts-list-spacer {
+  position: relative;
+}
+ul.hosts-rows {
+  position: absolute;
+  left: 0;
+  right: 0;
+  margin: 0;
+  padding: 0;
+  list-style: none;
+}
+ul.hosts-rows li {
+  height: 34px;
+  line-height: 18px;
+  overflow: hidden;
+  text-overflow: ellipsis;
+  white-space: nowrap;
+  cursor: pointer;
+}
+ul.hosts-rows li.group-entry {
+  padding: .5rem .8rem;
+  color: #d9d9d9;
+  background: #4e4a4a;
+}
+ul.hosts-rows li.group-entry:hover {
+  background: #555050;
+}
+ul.hosts-rows li.sub-li-item {
+  background: #e3e3e3;
+  padding: .5rem;
+  padding-left: 2rem;
+  color: #404040;
+  border-right: 1px solid #c9c9c9;
+}
+ul.hosts-rows li.sub-li-item:hover {
+  background: #d6d6d6;
+}
+.failed-only {
+  color: #fcfcfc;
+  font-weight: normal;
+  margin-left: 2rem;
+  cursor: pointer;
+}
+
 .sub-li-item-active {
   background: #fcfcfc !important;
   border-right: 1px solid #fcfcfc !important;
@@ -318,12 +380,15 @@ table tbody tr:last-of-type {
                 <img src="https://cdn.amendes.me/conquers/logo.svg" width=144 alt="logo">
               </div>
               <div class="search-box">
-                <input id="search-input" placeholder="filter hosts">
+                <input id="search-input" placeholder="host, group, status, error">
               </div>
+              <label class="failed-only">
+                <input type="checkbox" id="failed-only"> failed only
+              </label>
             </div>
 
-            <label class="alone">🏘️ GROUPS:</label>
-            <ul class="hosts-nav-entries">
+            <label class="alone">🏘️ GROUPS: <span id="hosts-count"></span></label>
+            <div class="hosts-list" id="hosts-list"></div>
 '''
     """
     Top part of the html page that can be generated as a report.
@@ -331,8 +396,6 @@ table tbody tr:last-of-type {
     """
 
     HTML_BOTTOM = '''
-            </ul>
-
             <div class="nav-stuff footer">
             <label>🔗 LINKS:</label>
               <ul class="links">
@@ -372,29 +435,297 @@ table tbody tr:last-of-type {
 (() => {
   'use strict';
 
-  class FilterHosts {
-    constructor() {
-      this.list = document.getElementsByClassName("sub-li-item");
-      this.search_input = document.getElementById("search-input");
-      this.addEvent();
+  /*
+   * The compact index of the report: per host only its name, status and
+   * first error. Hosts of a group and of a shard follow each other, so only
+   * the position of their first host is stored.
+   */
+  class ReportIndex {
+    constructor(data) {
+      this.hosts = data.hosts;
+      this.status = data.status;
+      this.errors = data.errors;
+      this.groups = data.groups.map((g) => g[0]);
+      this.group_starts = data.groups.map((g) => g[1]);
+      this.group_settings = data.groups.map((g) => g[2]);
+      this.shard_starts = data.shards;
+
+      /*
+       * What the search looks at.
+       */
+      this.keys = new Array(this.hosts.length);
+
+      for(let g = 0; g < this.groups.length; g++) {
+        for(let pos = this.group_starts[g]; pos < this.group_end(g); pos++) {
+          this.keys[pos] = [
+            this.hosts[pos],
+            this.groups[g],
+            ReportIndex.STATUS[this.status[pos]],
+            this.errors[pos] || ""
+          ].join(" ").toLowerCase();
+        }
+      }
     }
-    addEvent() {
-      this.search_input.addEventListener("keyup", (e) => {
-        let value = this.search_input.value;
-        for(let i = 0; i < this.list.length; i++) {
-          if(this.list[i].textContent.toLowerCase().includes(
-            value.toLowerCase()
-            )
-          ) {
-            this.list[i].style.display = "block";
-          }
-          else {
-            this.list[i].style.display = "none";
-          }
+
+    group_end(g) {
+      return (g + 1 < this.groups.length) ?
+        this.group_starts[g + 1] : this.hosts.length;
+    }
+
+    /*
+     * Returns the last of the ascending starts that is not after pos.
+     */
+    static find(starts, pos) {
+      let low = 0;
+      let high = starts.length - 1;
+
+      while(low < high) {
+        const middle = (low + high + 1) >> 1;
+
+        if(starts[middle] <= pos)
+          low = middle;
+        else
+          high = middle - 1;
+      }
+
+      return low;
+    }
+
+    /*
+     * Returns the shard of the host at pos and its index in the shard.
+     */
+    location(pos) {
+      const shard = ReportIndex.find(this.shard_starts, pos);
+
+      return [shard, pos - this.shard_starts[shard]];
+    }
+
+    /*
+     * Returns the group of the host at pos.
+     */
+    group_of(pos) {
+      return ReportIndex.find(this.group_starts, pos);
+    }
+  }
+  ReportIndex.STATUS = {o: "ok", f: "failed", s: "skipped"};
+  /*** class ReportIndex END ******************************/
+
+  /*
+   * The host list of the navigation. Only the visible rows are in the DOM,
+   * the spacer gives the list the height of all rows.
+   */
+  class HostList {
+    constructor(container, index, on_select, row_height=34, overscan=10) {
+      this.container = container;
+      this.index = index;
+      this.on_select = on_select;
+      this.row_height = row_height;
+      this.overscan = overscan;
+      this.filter = "";
+      this.failed_only = false;
+      this.collapsed = new Set();
+      this.active = -1;
+      this.rows = [];
+      this.counts = [];
+      this.shown = 0;
+      this.scheduled = false;
+
+      this.spacer = document.createElement("div");
+      this.spacer.className = "hosts-list-spacer";
+      this.list = document.createElement("ul");
+      this.list.className = "hosts-rows";
+      this.spacer.appendChild(this.list);
+      this.container.appendChild(this.spacer);
+
+      this.container.addEventListener("scroll", () => this.schedule());
+      window.addEventListener("resize", () => this.schedule());
+      this.list.addEventListener("click", (e) => this.click(e));
+      this.update();
+    }
+
+    set_filter(filter) {
+      this.filter = filter.toLowerCase();
+      this.container.scrollTop = 0;
+      this.update();
+    }
+
+    set_failed_only(failed_only) {
+      this.failed_only = failed_only;
+      this.container.scrollTop = 0;
+      this.update();
+    }
+
+    /*
+     * Rows are group headers (-1 - group) and hosts (position).
+     */
+    update() {
+      const rows = [];
+      this.counts = [];
+      this.shown = 0;
+
+      for(let g = 0; g < this.index.groups.length; g++) {
+        const header = rows.length;
+        let count = 0;
+        rows.push(-1 - g);
+
+        for(let pos = this.index.group_starts[g]; pos < this.index.group_end(g); pos++) {
+          if(this.failed_only && this.index.status[pos] !== "f")
+            continue;
+          if(this.filter && !this.index.keys[pos].includes(this.filter))
+            continue;
+
+          count++;
+
+          if(!this.collapsed.has(g))
+            rows.push(pos);
         }
+
+        // Hide groups without matches.
+        if(count === 0)
+          rows.length = header;
+
+        this.counts[g] = count;
+        this.shown += count;
+      }
+
+      this.rows = rows;
+      this.spacer.style.height = `${rows.length * this.row_height}px`;
+      document.getElementById("hosts-count").textContent =
+        `${this.shown} of ${this.index.hosts.length} hosts`;
+      this.render();
+    }
+
+    schedule() {
+      if(this.scheduled)
+        return;
+
+      this.scheduled = true;
+      window.requestAnimationFrame(() => {
+        this.scheduled = false;
+        this.render();
       });
     }
+
+    render() {
+      const first = Math.max(
+        0,
+        Math.floor(this.container.scrollTop / this.row_height) - this.overscan
+      );
+      const last = Math.min(
+        this.rows.length,
+        Math.ceil(
+          (this.container.scrollTop + this.container.clientHeight) / this.row_height
+        ) + this.overscan
+      );
+      const items = [];
+
+      for(let r = first; r < last; r++)
+        items.push(this.create_row(this.rows[r]));
+
+      this.list.style.top = `${first * this.row_height}px`;
+      this.list.replaceChildren(...items);
+    }
+
+    create_row(row) {
+      const li = document.createElement("li");
+
+      if(row < 0) {
+        const g = -1 - row;
+        li.className = "group-entry";
+        li.dataset.group = g;
+        li.textContent = `${this.collapsed.has(g) ? "▸" : "▾"} ` +
+          `${this.index.groups[g]} (${this.counts[g]})`;
+      }
+      else {
+        li.className = "sub-li-item " +
+          ((this.index.status[row] === "f") ? "error-red" : "ok-green");
+        li.dataset.pos = row;
+        li.textContent = this.index.hosts[row];
+        li.title = this.index.errors[row] || this.index.hosts[row];
+
+        if(row === this.active)
+          li.classList.add("sub-li-item-active");
+      }
+
+      return li;
+    }
+
+    click(e) {
+      const li = e.target.closest("li");
+
+      if(li === null)
+        return;
+
+      if(li.dataset.group !== undefined) {
+        const g = Number(li.dataset.group);
+
+        if(this.collapsed.has(g))
+          this.collapsed.delete(g);
+        else
+          this.collapsed.add(g);
+
+        this.update();
+        return;
+      }
+
+      this.active = Number(li.dataset.pos);
+      this.render();
+      this.on_select(this.active);
+    }
   }
+  /*** class HostList END *********************************/
+
+  /*
+   * Loads the shards of the report on demand. A shard is a script in the
+   * directory of the report calling conquersShard(number, results), script tags work
+   * over file:// where fetch does not. Only the last few shards are kept.
+   */
+  class ShardLoader {
+    constructor(directory, keep=8) {
+      this.directory = directory;
+      this.keep = keep;
+      this.shards = new Map();
+      this.pending = new Map();
+
+      window.conquersShard = (number, results) => {
+        this.shards.set(number, results);
+
+        while(this.shards.size > this.keep)
+          this.shards.delete(this.shards.keys().next().value);
+
+        if(this.pending.has(number)) {
+          this.pending.get(number).resolve(results);
+          this.pending.delete(number);
+        }
+      };
+    }
+
+    load(number) {
+      if(this.shards.has(number))
+        return Promise.resolve(this.shards.get(number));
+
+      if(this.pending.has(number))
+        return this.pending.get(number).promise;
+
+      const entry = {};
+      entry.promise = new Promise((resolve, reject) => {
+        entry.resolve = resolve;
+        const script = document.createElement("script");
+        script.src = `${this.directory}/shard-${String(number).padStart(5, "0")}.js`;
+        script.onload = () => script.remove();
+        script.onerror = () => {
+          script.remove();
+          this.pending.delete(number);
+          reject(new Error(`Cannot load ${script.src}.`));
+        };
+        document.body.appendChild(script);
+      });
+      this.pending.set(number, entry);
+
+      return entry.promise;
+    }
+  }
+  /*** class ShardLoader END ******************************/
 
   class Expander {
     constructor(elem, target, cssVisibleAttribute, useOpacityActive=false) {
@@ -418,8 +749,9 @@ table tbody tr:last-of-type {
   /*** class Expander END *********************************/
 
   class HTMLBuilder {
-    constructor(elem) {
-      this.clicked_node = elem;
+    constructor(index) {
+      this.index = index;
+      this.requests = 0;
       this.obj = {};
       this.group = "";
       this.host_obj = {};
@@ -428,55 +760,46 @@ table tbody tr:last-of-type {
       this.html = "";
       this.json_string = "";
       this.contentNode = this.gid("host-content");
-      this.check_error_set_color();
-      this.add_click_event(elem);
-      this.subListItemCssClass = "sub-li-item";
-      this.activeListCssClass = "sub-li-item-active";
     }
     /*** constructor END ***************/
 
     /*
-     * Check for error length in dataset-json
-     * and sets hostname green for ok or red
-     * if errors occured.
+     * Takes the result of the host from its shard and adds the settings
+     * of its group to those it overrides.
      */
-    check_error_set_color() {
-      this.json_string = this.clicked_node.dataset.json;
+    set_data(obj, group, settings) {
+      this.obj = obj;
+      this.error = "";
 
-      /*
-       * Get JSON object from dataset.
-       */
-      try {
-        this.obj = JSON.parse(this.json_string)
-      }
-      catch(e) {
-        let error = "[ERROR] No JSON data or erroneous data. This is a bug.";
-        this.error = this.ce("p");
-        this.error.textContent = error;
-        this.error.classList.add("error-red");
-        this.clicked_node.classList.add("error-red");
+      if(typeof(this.obj) !== "object" || this.obj === null) {
+        this.set_error("[ERROR] No JSON data or erroneous data. This is a bug.");
         return;
       }
 
-      // Get first key with is the group name.
-      for(let g in this.obj) {
-        this.group = g;
-        break;
-      }
+      this.group = group;
 
       // Get the host name and set object.
-      for(let h in this.obj[this.group][0]) {
+      for(let h in this.obj) {
         this.host = h;
-        this.host_obj = this.obj[this.group][0][h]
         break;
       }
 
-      if(this.host_obj["errors"].length > 0)
-        this.clicked_node.classList.add("error-red");
-      else 
-        this.clicked_node.classList.add("ok-green");
+      // Copied, the shard stays as loaded.
+      const result = this.obj[this.host];
+      this.host_obj = Object.assign({}, result, {
+        config: Object.assign({}, result["config"], {
+          settings: Object.assign({}, settings, result["config"]["settings"])
+        })
+      });
+    }
+    /*** set_data END ******************/
+
+    set_error(error) {
+      this.obj = {};
+      this.error = this.ce("p");
+      this.error.textContent = error;
+      this.error.classList.add("error-red");
     }
-    /*** check_error_set_color END *****/
 
     /*
      * shorteners
@@ -495,45 +818,53 @@ table tbody tr:last-of-type {
     }
     /*** shorteners END ****************/
 
-    set_active(elem) {
-      let all_items = document.getElementsByClassName(this.subListItemCssClass);
-      for(let i = 0; i< all_items.length; i++) {
-        all_items[i].classList.remove(this.activeListCssClass);
-      }
-
-      elem.classList.add(this.activeListCssClass);
-    }
     /*
-     * Add click event for host item:
-     *  * sets clicked elem avtive
+     * Shows the host at pos of the index:
+     *  * loads the shard with its result
      *  * builds html
      *  * shows html
      *  * makes tables expandable using class Expander
      */
-    add_click_event(elem) {
-      elem.addEventListener("click", (e) => {
-        this.set_active(elem);
-        this.buildHTML(elem);
-        this.show_html().then(
-          (resp) => {
-            setTimeout(() => {
-              let heads = document.getElementsByTagName("thead");
-
-              for(let i = 0; i < heads.length; i++) {
-                let target = heads[i].parentNode.getElementsByTagName("tbody")[0];
-                let expander = new Expander(
-                  heads[i],
-                  target,
-                  "table-row-group",
-                  true
-                );
-              }
-            }, 100);
-          }
-        )
-      });
+    show(pos) {
+      const [shard, index] = this.index.location(pos);
+      const group = this.index.group_of(pos);
+      const request = ++this.requests;
+
+      shard_loader.load(shard).then(
+        (results) => this.set_data(
+          results[index],
+          this.index.groups[group],
+          this.index.group_settings[group]
+        ),
+        (error) => this.set_error(`[ERROR] ${error.message}`)
+      ).then(
+        () => {
+          // Another host was clicked in the meantime.
+          if(request !== this.requests)
+            return;
+
+          this.buildHTML();
+          return this.show_html().then(
+            (resp) => {
+              setTimeout(() => {
+                let heads = document.getElementsByTagName("thead");
+
+                for(let i = 0; i < heads.length; i++) {
+                  let target = heads[i].parentNode.getElementsByTagName("tbody")[0];
+                  let expander = new Expander(
+                    heads[i],
+                    target,
+                    "table-row-group",
+                    true
+                  );
+                }
+              }, 100);
+            }
+          );
+        }
+      );
     }
-    /*** add_click_event END ***********/
+    /*** show END **********************/
 
     create_commands_table(type) {
       const t = {
@@ -598,7 +929,7 @@ table tbody tr:last-of-type {
     }
     /*** create_commands_table END *****/
 
-    buildHTML(elem) {
+    buildHTML() {
       // No dataset -> return
       // This should not happen.
       if(Object.keys(this.obj).length === 0)
@@ -865,33 +1196,38 @@ table tbody tr:last-of-type {
   /*** class HTMLBuilder END ******************************/
 
   /*
-   * Make Groups expandable
+   * Index of the report, written by conquers.
    */
-  const all_groups = document.getElementsByClassName("group-entry");
-  for(let i = 0; i < all_groups.length; i++) {
-    let expander = new Expander(all_groups[i], all_groups[i].nextSibling.nextSibling, "block");
-  }
+  const report_data = JSON.parse(
+    document.getElementById("report-index").textContent
+  );
+  const report_index = new ReportIndex(report_data);
+  const shard_loader = new ShardLoader(
+    report_data.shards_dir || "report-shards"
+  );
 
   /*
    * Show report when host clicked.
    */
-  const all_lists = document.getElementsByClassName("hosts-nav-sub");
-  for(let i = 0; i < all_lists.length; i++) {
-    let all_hosts = all_lists[i].getElementsByTagName("li");
-    for(let j = 0; j < all_hosts.length; j++) {
-      try {
-        let builder = new HTMLBuilder(all_hosts[j]);
-      }
-      catch(e) {
-        console.log(e);
-      }
-    }
-  }
-  
+  const builder = new HTMLBuilder(report_index);
+  const host_list = new HostList(
+    document.getElementById("hosts-list"),
+    report_index,
+    (pos) => builder.show(pos)
+  );
+
   /*
    * Filter hosts.
    */
-  const filter_hosts =  new FilterHosts();
+  const search_input = document.getElementById("search-input");
+  search_input.addEventListener("input", (e) => {
+    host_list.set_filter(search_input.value);
+  });
+
+  const failed_only = document.getElementById("failed-only");
+  failed_only.addEventListener("change", (e) => {
+    host_list.set_failed_only(failed_only.checked);
+  });
 
 })();
     </script>
@@ -17,6 +17,40 @@ class CredentialsError(Exception):
 class CryptoError(Exception):
     pass
 
+def decrypt_password(encrypted_pass, master_key) -> str:
+    """
+    Decodes the base64 string **encrypted_pass** and decrypts it using
+    **master_key** (32 bytes). Raises :py:class:`CryptoError` on failure.
+
+    This is a plain function, so workers can decrypt a password right before
+    they connect without a :py:class:`Credentials` instance.
+    """
+
+    decoded = base64.b64decode(encrypted_pass)
+
+    nonce = decoded[0:16]
+    tag = decoded[16:32]
+    ciphertext = decoded[32:len(decoded)]
+
+    cipher = AES.new(master_key, AES.MODE_EAX, nonce)
+    try:
+        data = cipher.decrypt_and_verify(ciphertext, tag)
+    except Exception as e:
+        raise CryptoError(e) from e
+
+    return "{}".format(data.decode())
+
+def warm_up_cipher() -> None:
+    """
+    Loads the modules and native libraries of AES in EAX mode, which
+    pycryptodome only does on first use. Called in the parent, forked
+    workers inherit them instead of each loading them again before
+    :py:func:`decrypt_password`.
+    """
+
+    cipher = AES.new(bytes(32), AES.MODE_EAX)
+    cipher.encrypt_and_digest(b"")
+
 class Credentials:
     """
     A class to check, retrieve, add, encrypt and decrypt credentials necessary
@@ -38,12 +72,23 @@ class Credentials:
             master key. If not provided
             :py:func:`~cscredentials.Credentials.__init__` will ask for it
             using the python module `getpass <https://docs.python.org/3/library/getpass.html>`_.
+        exact (dict)
+            Index of entries for a single host, built by
+            :py:func:`~credentials.Credentials.load_index`.
+            Maps the host to ``(line number, user, encrypted password)``.
+        wildcards (list)
+            Index of entries containing a wildcard, built by
+            :py:func:`~credentials.Credentials.load_index`. Holds
+            ``(compiled regex, (line number, user, encrypted password))`` in
+            the order of the file.
 
     """
 
     def __init__(self, credentials_file, master_key=None) -> None:
         self.credentials_file = credentials_file.replace("~", str(Path.home()))
         self.file_handle = None
+        self.exact = None
+        self.wildcards = None
 
         if master_key is not None:
             if Path(
@@ -115,19 +160,7 @@ class Credentials:
         :py:class:`~credentials.Credentials.master_key`
         """
 
-        decoded = base64.b64decode(credentials["encrypted_pass"])
-
-        nonce = decoded[0:16]
-        tag = decoded[16:32]
-        ciphertext = decoded[32:len(decoded)]
-
-        cipher = AES.new(self.master_key, AES.MODE_EAX, nonce)
-        try:
-            data = cipher.decrypt_and_verify(ciphertext, tag)
-        except Exception as e:
-            raise CryptoError(e) from e
-
-        return "{}".format(data.decode())
+        return decrypt_password(credentials["encrypted_pass"], self.master_key)
 
     def add_entry(self, credentials) -> None:
         """
@@ -142,6 +175,9 @@ class Credentials:
                 "{user}@{host}:{encrypted_pass}\n".format(**credentials)
             )
 
+        # The index is outdated now.
+        self.exact = None
+
     def override_entry(self, credentials) -> None:
         """
         Override matching credentials entry with the new one.
@@ -164,6 +200,9 @@ class Credentials:
                 else:
                     self.file_handle.write(l)
 
+        # The index is outdated now.
+        self.exact = None
+
     def check_entry_exists(self, host) -> str:
         """
         Returns `user@host` of the match, if found,
@@ -265,7 +304,60 @@ class Credentials:
 
         return True
 
-    def return_credentials(self, host) -> dict:
+    def load_index(self) -> None:
+        """
+        Reads :py:class:`~credentials.Credentials.credentials_file` once and
+        builds :py:class:`~credentials.Credentials.exact` and
+        :py:class:`~credentials.Credentials.wildcards`, so looking up a host
+        does not touch the file again.
+
+        The workers decrypt, the cipher is warmed up here once for all of
+        them, see :py:func:`warm_up_cipher`.
+        """
+
+        warm_up_cipher()
+        self.exact = {}
+        self.wildcards = []
+
+        with open(self.credentials_file, "r", encoding="utf-8") as \
+                self.file_handle:
+            for position, l in enumerate(self.file_handle):
+                if not l.strip():
+                    continue
+
+                up = l.split(":")
+                uh = up[0].split("@")
+                entry = (position, uh[0], up[1].rstrip())
+
+                if "*" in uh[1]:
+                    self.wildcards.append((re.compile(uh[1]), entry))
+                else:
+                    # The first entry wins, like in the file.
+                    self.exact.setdefault(uh[1], entry)
+
+    def find_entry(self, host) -> tuple:
+        """
+        Returns ``(line number, user, encrypted password)`` of the first entry
+        in the file matching **host**, ``None`` if there is none.
+        An exact match is an O(1) lookup, only wildcards written before it
+        have to be tried.
+        """
+
+        if self.exact is None:
+            self.load_index()
+
+        match = self.exact.get(host)
+
+        for regex, entry in self.wildcards:
+            if match is not None and entry[0] > match[0]:
+                break
+
+            if regex.match(host):
+                return entry
+
+        return match
+
+    def return_credentials(self, host, decrypt=True) -> dict:
         """
         Returns credentials dictionary if entry found
 
@@ -280,39 +372,36 @@ class Credentials:
                 }
 
         Returns empty dictionary otherwise.
-        """
 
-        with open(self.credentials_file, "r", encoding="utf-8") as \
-                self.file_handle:
-            lines = self.file_handle.readlines()
+        If **decrypt** is ``False``, only the matching entry is resolved and
+        ``"pass"`` is left out. The worker decrypts the password right before
+        it connects (see :py:func:`~credentials.decrypt_password`), so
+        plain text passwords never pile up in the parent.
+        """
 
-        for l in lines:
-            up = l.split(":")
-            uh = up[0].split("@")
+        entry = self.find_entry(host)
 
-            # try to match when wildcard found.
-            regex = None
-            if "*" in uh[1]:
-                regex = re.compile(uh[1])
+        if entry is None:
+            return {}
 
-            if host == uh[1] or (regex is not None and regex.match(host)):
-                credentials = {
-                    "user": uh[0],
-                    "host": host,
-                    "encrypted_pass": up[1].rstrip()
-                }
+        credentials = {
+            "user": entry[1],
+            "host": host,
+            "encrypted_pass": entry[2]
+        }
 
-                try:
-                    credentials["pass"] = self.decrypt_pass(credentials)
-                except CryptoError as e:
-                    print(e)
-                    print(
-                        "Probably the master key is not correct or the path" + 
-                        " (if passed)" +
-                        " does not exist."
-                    )
-                    sys.exit(1)
+        if not decrypt:
+            return credentials
 
-                return credentials
+        try:
+            credentials["pass"] = self.decrypt_pass(credentials)
+        except CryptoError as e:
+            print(e)
+            print(
+                "Probably the master key is not correct or the path" + 
+                " (if passed)" +
+                " does not exist."
+            )
+            sys.exit(1)
 
-        return {}
+        return credentials
@@ -0,0 +1,250 @@
+"""
+Session daemon that keeps the connections to the switches open between
+runs, started with ``conquers --daemon``.
+
+Runs with ``--engine daemon`` hand their hosts to the daemon over a UNIX
+socket in ``~/.conquers`` instead of connecting themselves. The daemon
+runs each host in a thread and answers with the frames of :py:mod:`ipc`.
+After a successful run the session goes back into a
+:py:class:`SessionPool`, so the next job for the same switch skips the SSH
+handshake, the authentication and netmiko's prompt discovery.
+
+Idle sessions are closed after ``--idle-timeout`` seconds and the least
+recently used ones once more than ``--pool-size`` are idle.
+"""
+import os
+import sys
+import time
+import socket
+import signal
+import threading
+from collections import OrderedDict
+# conquers libraries
+from collector import Collector
+from engines import stream_host
+from ipc import\
+        recv_frame,\
+        IpcError,\
+        MSG_JOB
+
+class DaemonError(Exception):
+    pass
+
+class SessionPool:
+    """
+    Idle netmiko sessions, least recently used first.
+
+    A session is taken out of the pool while a job uses it, so no two jobs
+    ever share one.
+
+    Attributes:
+        size (int): Maximum number of idle sessions.
+        idle_timeout (int): Seconds after which an idle session is closed.
+        sessions (collections.OrderedDict): Session key -> ``(device,
+            time it was released)``.
+        lock (threading.Lock): Guards :py:attr:`sessions`.
+    """
+
+    def __init__(self, size=100, idle_timeout=300) -> None:
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def close(device) -> None:
+        """
+        Closes **device**, errors are ignored.
+        """
+
+        try:
+            device.disconnect()
+        except Exception:
+            pass
+
+    def acquire(self, key):
+        """
+        Takes the idle session of **key** out of the pool and returns it if
+        it is still alive. Returns ``None`` otherwise.
+        """
+
+        with self.lock:
+            entry = self.sessions.pop(key, None)
+
+        if entry is None:
+            return None
+
+        device, released = entry
+
+        try:
+            if device.is_alive():
+                return device
+        except Exception:
+            pass
+
+        self.close(device)
+
+        return None
+
+    def release(self, key, device) -> None:
+        """
+        Puts **device** back into the pool as the most recently used
+        session. Closes the least recently used ones if the pool is full.
+        """
+
+        evicted = []
+
+        with self.lock:
+            if key in self.sessions:
+                evicted.append(self.sessions.pop(key)[0])
+
+            self.sessions[key] = (device, time.monotonic())
+
+            while len(self.sessions) > self.size:
+                evicted.append(self.sessions.popitem(last=False)[1][0])
+
+        for device in evicted:
+            self.close(device)
+
+    def evict_idle(self) -> None:
+        """
+        Closes all sessions that were idle longer than
+        :py:attr:`idle_timeout`.
+        """
+
+        deadline = time.monotonic() - self.idle_timeout
+        evicted = []
+
+        with self.lock:
+            while self.sessions:
+                key, (device, released) = next(iter(self.sessions.items()))
+
+                if released > deadline:
+                    break
+
+                del self.sessions[key]
+                evicted.append(device)
+
+        for device in evicted:
+            self.close(device)
+
+    def close_all(self) -> None:
+        """
+        Closes all idle sessions.
+        """
+
+        with self.lock:
+            evicted = [device for device, released in self.sessions.values()]
+            self.sessions.clear()
+
+        for device in evicted:
+            self.close(device)
+
+class Daemon:
+    """
+    Serves jobs on a UNIX socket that only the user can access.
+
+    Attributes:
+        socket_path (str): Path of the socket.
+        master_key (bytes): Decrypts the passwords of the jobs.
+        sessions (:py:class:`SessionPool`): The idle sessions.
+    """
+
+    def __init__(self, socket_path, master_key, pool_size=100,
+                 idle_timeout=300) -> None:
+        self.socket_path = socket_path
+        self.master_key = master_key
+        self.sessions = SessionPool(pool_size, idle_timeout)
+
+    def bind(self) -> socket.socket:
+        """
+        Returns the listening socket. A socket file left behind by a daemon
+        that is gone is removed, a running daemon is an error.
+        """
+
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+            try:
+                probe.connect(self.socket_path)
+            except OSError:
+                os.unlink(self.socket_path)
+            else:
+                raise DaemonError(
+                    f"A daemon is already listening on {self.socket_path}."
+                )
+            finally:
+                probe.close()
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Nobody else may connect and use the sessions.
+        umask = os.umask(0o177)
+
+        try:
+            server.bind(self.socket_path)
+        finally:
+            os.umask(umask)
+
+        server.listen()
+
+        return server
+
+    def serve(self) -> None:
+        """
+        Accepts jobs until the daemon is interrupted or terminated.
+        """
+
+        server = self.bind()
+        # Let SIGTERM unwind like SIGINT does.
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        # Wake up regularly to close idle sessions.
+        server.settimeout(max(1, min(self.sessions.idle_timeout, 5)))
+
+        Collector.print_info(f"Listening on {self.socket_path}")
+
+        try:
+            while True:
+                try:
+                    conn, addr = server.accept()
+                except socket.timeout:
+                    pass
+                else:
+                    threading.Thread(
+                        target=self.handle,
+                        args=(conn,),
+                        daemon=True
+                    ).start()
+
+                self.sessions.evict_idle()
+        finally:
+            server.close()
+            os.unlink(self.socket_path)
+            self.sessions.close_all()
+
+    def handle(self, conn) -> None:
+        """
+        Runs the job received on **conn** and reports back on it.
+        """
+
+        conn.settimeout(None)
+
+        try:
+            msg_type, job = recv_frame(conn)
+
+            if msg_type != MSG_JOB:
+                raise IpcError(f"Expected a job, got message type {msg_type}.")
+
+            Collector.print_mild_info(
+                f'   *    {job["group"]}/{job["host"]["host"]}'
+            )
+            stream_host(
+                conn,
+                job["group"],
+                job["host"],
+                self.master_key,
+                self.sessions
+            )
+        except (IpcError, OSError, KeyError, TypeError) as e:
+            Collector.print_error(f"Job failed: {e}")
+        finally:
+            conn.close()
@@ -0,0 +1,898 @@
+"""
+Execution engines used by conquers to run the configured commands on hosts.
+
+Every engine runs :py:func:`run_host` for the hosts handed out by a
+:py:class:`~scheduler.Scheduler` and hands the results to the
+:py:class:`~collector.Collector` as soon as they arrive.
+
+Available engines (``--engine``):
+    * ``fork`` (default): one forked child per host, results are sent back
+      over a private pair of UNIX sockets.
+    * ``process-pool``: a reusable pool of worker processes.
+    * ``threads``: a pool of threads in the parent process.
+    * ``asyncio``: an event loop that offloads the blocking netmiko calls
+      to a thread pool.
+    * ``daemon``: hands the hosts to a running ``conquers --daemon``, which
+      keeps the sessions to the switches open between runs.
+"""
+import sys
+import os
+import time
+import socket
+import asyncio
+import selectors
+from concurrent.futures import\
+        ThreadPoolExecutor,\
+        ProcessPoolExecutor,\
+        wait,\
+        FIRST_COMPLETED
+# conquers libraries
+from switch import CsSwitch
+from constants import Constants as Const
+from ipc import\
+        FrameReader,\
+        IpcError,\
+        send_frame,\
+        MSG_PROGRESS,\
+        MSG_OUTPUT,\
+        MSG_RESULT,\
+        MSG_JOB
+from collector import\
+        Collector,\
+        CollectorError
+from profiling import\
+        profile_call,\
+        forget_parent
+
+class EngineError(Exception):
+    pass
+
+# Keys conquers adds to a host for its own use, they are not reported.
+INTERNAL_KEYS = ("coalesced", "ip", "resolve_time", "resolve_error")
+
+def reported_config(host) -> dict:
+    """
+    Returns a copy of **host** without the keys conquers adds for its own
+    use, **host** itself is still needed to reach the switch.
+    """
+
+    return {k: v for k, v in host.items() if k not in INTERNAL_KEYS}
+
+def new_output_object(group, host) -> dict:
+    """
+    Returns the output structure that is filled per host. The time it
+    took to resolve the name of **host** is its ``resolve`` timing.
+    """
+
+    output_object = {
+        "group": group,
+        "host": host["host"],
+        "errors": [],
+        "rc": 0,
+        "output": {
+            "cmds_before": [],
+            "cmds_after": [],
+            "conf_cmds": []
+        },
+        "message": "",
+        # Durations in seconds, see run_host().
+        "timings": {},
+        # Add config for host.
+        "config": host
+    }
+
+    if host.get("resolve_time") is not None:
+        output_object["timings"]["resolve"] = host["resolve_time"]
+
+    return output_object
+
+def mark_failed(output_object, exception) -> dict:
+    """
+    Adds **exception** to the errors of **output_object** and marks it as
+    failed.
+    """
+
+    output_object["errors"].append(
+        f"Exception: {exception}"
+    )
+    output_object["message"] = "failed"
+    output_object["rc"] = 1
+
+    return output_object
+
+def failed_output(group, host, exception) -> dict:
+    """
+    Returns the output structure of **host** marked as failed with
+    **exception**. Hosts coalesced with it (see :py:func:`run_host`) are
+    marked as failed, too.
+    """
+
+    output_object = mark_failed(new_output_object(group, host), exception)
+
+    if host.get("coalesced"):
+        output_object["coalesced"] = [
+            mark_failed(new_output_object(c["group"], c["host"]), exception)
+            for c in host["coalesced"]
+        ]
+
+    return output_object
+
+def attach_config(data, host) -> dict:
+    """
+    Sets ``config`` of **data** and of its coalesced results to the host
+    objects of the parent, which share their settings, instead of copies
+    returned by a worker.
+    """
+
+    data["config"] = host
+
+    for output_object, c in zip(data.get("coalesced", []),
+                                host.get("coalesced", [])):
+        output_object["config"] = c["host"]
+
+    return data
+
+def run_host(group, host, progress=None, master_key=None,
+             sessions=None) -> dict:
+    """
+    Connects to **host**, sends the before, configuration and after commands
+    and returns the output structure (see :py:func:`new_output_object`).
+
+    This is the unit of work every engine executes. It must stay a module
+    level function so it can be pickled for the process pool.
+
+    If the same switch is listed in several groups with the same port and
+    device type, the later occurrences are in ``coalesced`` of **host**
+    (see :py:func:`conquers.gen_switch_config_objects`). Their commands are
+    sent over the same session right after the ones of **host**, in group
+    order, and their output structures are returned in ``coalesced`` of the
+    result. Should a command fail, the session is closed and the next
+    occurrence connects again.
+
+    ``timings`` of the output structure holds durations in seconds:
+    ``resolve`` (by the parent, see :py:class:`~resolver.Resolver`),
+    ``connect``, ``config_mode_enter``, ``config_mode_exit``, one per
+    phase, ``cmd_sets`` with the durations of the command sets per phase
+    and ``total``. Coalesced occurrences only have ``resolve`` and
+    ``connect`` if they connected themselves.
+
+    Args:
+        group (str): The group name.
+        host (dict): The host object from
+            :py:func:`conquers.gen_switch_config_objects`.
+        progress (callable): Optional. Called as ``progress(phase)`` when a
+            phase starts and as ``progress(phase, lines)`` once the commands
+            of a phase have been sent. The phases are ``connect``,
+            ``cmds_before``, ``conf_cmds`` and ``cmds_after``. Only called
+            for **host** itself, not for coalesced occurrences.
+        master_key (bytes): Decrypts the password, see
+            :py:class:`~switch.CsSwitch`.
+        sessions (:py:class:`~daemon.SessionPool`): Optional. Reuse open
+            sessions, see :py:class:`~switch.CsSwitch`. Only sessions of
+            hosts that succeeded go back to the pool.
+    """
+
+    if progress is None:
+        progress = lambda phase, lines=None: None
+
+    quiet = lambda phase, lines=None: None
+    output_object = new_output_object(group, host)
+    steps = [(host, output_object, progress)]
+
+    for c in host.get("coalesced", []):
+        steps.append(
+            (c["host"], new_output_object(c["group"], c["host"]), quiet)
+        )
+
+    if len(steps) > 1:
+        output_object["coalesced"] = [o for h, o, p in steps[1:]]
+
+    csswitch = None
+
+    try:
+        for i, (step_host, step_output, step_progress) in enumerate(steps):
+            start = time.perf_counter()
+            timings = step_output["timings"]
+
+            if csswitch is None:
+                step_progress("connect")
+
+                try:
+                    csswitch = CsSwitch(step_host, master_key, sessions)
+                except Exception as e:
+                    timings["connect"] = round(time.perf_counter() - start, 6)
+                    timings["total"] = timings["connect"]
+
+                    # The switch is not reachable for the others either.
+                    for h, o, p in steps[i:]:
+                        mark_failed(o, e)
+                    break
+
+                timings.update(csswitch.take_timings())
+
+            try:
+                if csswitch.config is not step_host:
+                    csswitch.use_config(step_host)
+
+                send_phases(csswitch, step_output, step_progress)
+            except Exception as e:
+                # Not only CsSwitchError, netmiko's own exceptions must not
+                # cost the results of the occurrences before this one.
+                mark_failed(step_output, e)
+                # A session in an unknown state is never reused.
+                csswitch.disconnect()
+                csswitch = None
+            finally:
+                timings["total"] = round(time.perf_counter() - start, 6)
+    except BaseException:
+        # Interrupted in an unknown state, e.g. the daemon's client is gone
+        # or Ctrl-C.
+        if csswitch is not None:
+            csswitch.disconnect()
+        raise
+
+    if csswitch is not None:
+        csswitch.release()
+
+    return output_object
+# ---- run_host() END ----------------------------------------------------------
+
+def send_phases(csswitch, output_object, progress) -> None:
+    """
+    Sends the before, configuration and after commands of **csswitch** and
+    stores their output in **output_object**. See :py:func:`run_host` for
+    **progress**.
+    """
+
+    phases = [
+        # Send BEFORE commands.
+        ("cmds_before", lambda: csswitch.send_cmds_ba("before")),
+        # Send CONFIG commands.
+        ("conf_cmds", csswitch.send_conf_cmds),
+        # Send AFTER commands.
+        ("cmds_after", lambda: csswitch.send_cmds_ba("after")),
+    ]
+
+    timings = output_object["timings"]
+    timings["cmd_sets"] = {}
+
+    for phase, send in phases:
+        progress(phase)
+        start = time.perf_counter()
+
+        try:
+            output = send()
+        finally:
+            timings[phase] = round(time.perf_counter() - start, 6)
+            recorded = csswitch.take_timings()
+            timings["cmd_sets"][phase] = recorded.pop("cmd_sets", [])
+            timings.update(recorded)
+
+        output_object["output"][phase] = output.splitlines()
+        progress(phase, output_object["output"][phase])
+
+    output_object["message"] = "ok"
+
+def stream_host(conn, group, host, master_key=None, sessions=None) -> int:
+    """
+    Runs **host** like :py:func:`run_host` and reports on the blocking
+    socket **conn** using the frames of :py:mod:`ipc`: a progress frame per
+    phase, the output of every command set as soon as it is available and
+    the result as the last frame. Returns the ``rc`` of the host.
+
+    Used by the children of :py:class:`ForkEngine` and by the session
+    daemon.
+    """
+
+    streamed = []
+
+    def progress(phase, lines=None) -> None:
+        if lines is None:
+            send_frame(conn, MSG_PROGRESS, {
+                "phase": phase
+            })
+        else:
+            send_frame(conn, MSG_OUTPUT, {
+                "cmds": phase,
+                "lines": lines
+            })
+            streamed.append(phase)
+
+    try:
+        output_object = run_host(group, host, progress, master_key, sessions)
+    except Exception as e:
+        output_object = failed_output(group, host, e)
+
+    # Output that was streamed already is not sent twice and the receiver
+    # still has the config of the host.
+    for phase in streamed:
+        output_object["output"][phase] = []
+
+    for o in [output_object, *output_object.get("coalesced", [])]:
+        o.pop("config", None)
+
+    send_frame(conn, MSG_RESULT, output_object)
+
+    return output_object["rc"]
+# ---- stream_host() END -------------------------------------------------------
+
+class Engine:
+    """
+    Base class of all engines.
+
+    An engine takes jobs from a :py:class:`~scheduler.Scheduler` as long as
+    it hands some out, then waits for at least one running host to finish
+    and repeats until the scheduler is idle. Subclasses implement
+    :py:meth:`submit` and :py:meth:`wait_results`.
+
+    Attributes:
+        coll (:py:class:`~collector.Collector`): Receives the results.
+        max_workers (int): Size of the worker pool, if the engine uses one.
+            Usually the largest number of hosts that can be in flight.
+        show_group (bool): Prefix hosts with their group in the console
+            output. Used when groups run concurrently.
+        master_key (bytes): Handed to the workers, which decrypt the
+            password of their host right before connecting.
+        profile_dir (str): If set, workers write a profile per host to
+            this directory, see :py:mod:`profiling`.
+        observers (list): Callables that are called with every result,
+            skipped ones included, after it was added to the collection.
+    """
+
+    def __init__(self, coll, max_workers=1, show_group=False,
+                 master_key=None, profile_dir=None) -> None:
+        self.coll = coll
+        self.max_workers = max(1, max_workers)
+        self.show_group = show_group
+        self.master_key = master_key
+        self.profile_dir = profile_dir
+        self.observers = []
+
+    def start(self) -> None:
+        """
+        Sets up resources shared by all groups.
+        """
+
+    def stop(self) -> None:
+        """
+        Releases the resources set up by :py:meth:`start`.
+        """
+
+    def run(self, scheduler) -> None:
+        """
+        Runs every host handed out by **scheduler**.
+        """
+
+        while True:
+            while (job := scheduler.next_job()) is not None:
+                obj, host = job
+
+                if self.skip_host(obj["group"], host):
+                    scheduler.done(obj["group"])
+                    continue
+
+                self.submit(obj["group"], host)
+
+            if scheduler.idle():
+                break
+
+            for group in self.wait_results():
+                scheduler.done(group)
+
+    def submit(self, group, host) -> None:
+        """
+        Starts **host** of **group**.
+        """
+
+        raise NotImplementedError
+
+    def wait_results(self) -> list:
+        """
+        Waits until at least one host has finished, handles the results and
+        returns the group names of the finished hosts.
+        """
+
+        raise NotImplementedError
+
+    def label(self, group, host, show_group=False) -> str:
+        """
+        Returns the name used for **host** in the console output. The group
+        is shown if the engine or **show_group** asks for it.
+        """
+
+        if self.show_group or show_group:
+            return f"{group}/{host}"
+
+        return host
+
+    def skip_host(self, group, host) -> bool:
+        """
+        Announces **host** and collects it as skipped if no credentials
+        were found or as failed if its name could not be resolved.
+        Returns ``True`` if the host was not started.
+        """
+
+        name = self.label(group, host["host"])
+        Collector.print_mild_info(f'   *    {name}')
+
+        if host["credentials"] and host.get("resolve_error") is None:
+            return False
+
+        if host["credentials"]:
+            output_object = failed_output(
+                group,
+                host,
+                f'Cannot resolve {host["host"]}: {host["resolve_error"]}'
+            )
+            self.handle_result(output_object)
+
+            return True
+
+        Collector.print_warning(
+            f'   ✝    {name} No credentials found, skipping ...'
+        )
+
+        # Coalesced hosts are the same switch, so they lack credentials, too.
+        for g, h in [(group, host)] + \
+                [(c["group"], c["host"]) for c in host.get("coalesced", [])]:
+            output_object = new_output_object(g, h)
+            output_object["rc"] = None
+            output_object["message"] = "skipped"
+            output_object["config"] = reported_config(h)
+            self.coll.add_to_collection(output_object)
+            self.notify(output_object)
+
+        return True
+
+    def notify(self, data) -> None:
+        """
+        Hands the collected result **data** to the observers.
+        """
+
+        for observer in self.observers:
+            observer(data)
+
+    def handle_result(self, data, show_group=False) -> None:
+        """
+        Prints the state of a finished host, logs its output and adds it to
+        the collection. Results of hosts coalesced with it follow, labeled
+        with their group.
+        """
+
+        coalesced = data.pop("coalesced", [])
+        name = self.label(data["group"], data["host"], show_group)
+
+        # Coalesced hosts are reported on their own, the address and the
+        # resolve time of a host are not part of its configuration.
+        data["config"] = reported_config(data["config"])
+
+        if data["errors"]:
+            Collector.print_error(f'   ⨯    {name}')
+            Collector.print_error(f'        {data["errors"][0]}')
+        else:
+            Collector.print_info(f'   ✓    {name}')
+
+        # If log_file is defined, log output.
+        try:
+            self.coll.log_to_file(data)
+        except CollectorError as e:
+            self.coll.print_warning(f'   !    {e}')
+        # Hide passwords in console output.
+        self.coll.hide_passwords(data)
+        # The single summary can be silenced in the configuration with
+        # silent: true
+        self.coll.print_single_summary(data)
+        # -------------------------------------------------------
+        self.coll.add_to_collection(data)
+        # -------------------------------------------------------
+
+        self.notify(data)
+
+        for output_object in coalesced:
+            self.handle_result(output_object, show_group=True)
+
+class ChildChannel:
+    """
+    State the parent keeps for the connection of one forked child.
+
+    Attributes:
+        group (str): Group of the host the child runs.
+        host (dict): The host the child runs.
+        reader (:py:class:`~ipc.FrameReader`): Reassembles the frames.
+        phase (str): The phase the child reported last.
+        output (dict): Output of the command sets streamed so far.
+        result (dict): The final output structure, once received.
+    """
+
+    def __init__(self, group, host) -> None:
+        self.group = group
+        self.host = host
+        self.reader = FrameReader()
+        self.phase = "start"
+        self.output = {}
+        self.result = None
+
+class ForkEngine(Engine):
+    """
+    Forks one child per host. Every child gets its own connected pair of
+    UNIX sockets (``socket.socketpair()``), so no socket file is shared and
+    several conquers runs can safely work on the same machine at once.
+
+    The child reports back using the framed protocol of :py:mod:`ipc`:
+    progress frames when it enters a phase, the output of every command set
+    as soon as it is available and the final result. A new child is forked
+    as soon as any running child has reported back, so one slow switch only
+    occupies its own slot.
+
+    The parent never blocks on a single child: the connections of all
+    children are watched with a
+    `selector <https://docs.python.org/3/library/selectors.html>`_, so many
+    children are read at once and results are handled in the order they
+    complete.
+
+    Attributes:
+        selector (selectors.BaseSelector): Watches the connections of the
+            children. The data of a connection is its :py:class:`ChildChannel`.
+    """
+
+    def __init__(self, coll, **kwargs) -> None:
+        super().__init__(coll, **kwargs)
+        self.selector = None
+
+    def start(self) -> None:
+        self.selector = selectors.DefaultSelector()
+
+    def stop(self) -> None:
+        if self.selector is not None:
+            self.close_channels()
+            self.selector = None
+
+        self.reap_children(block=True)
+
+    def close_channels(self) -> None:
+        """
+        Closes the connections to all children and the selector.
+        """
+
+        for key in list(self.selector.get_map().values()):
+            key.fileobj.close()
+
+        self.selector.close()
+
+    def submit(self, group, host) -> None:
+        parent_end, child_end = socket.socketpair()
+        pid = os.fork()
+
+        if pid == 0:
+            parent_end.close()
+            self.run_child(child_end, group, host)     # never returns
+
+        child_end.close()
+        parent_end.setblocking(False)
+        self.selector.register(
+            parent_end,
+            selectors.EVENT_READ,
+            ChildChannel(group, host)
+        )
+
+    def wait_results(self) -> list:
+        groups = []
+
+        while not groups:
+            for key, mask in self.selector.select():
+                data = self.receive_result(key)
+
+                if data is not None:
+                    groups.append(data["group"])
+
+        self.reap_children()
+
+        return groups
+
+    def run_child(self, s_conn, group, host) -> None:
+        """
+        Runs in the forked child and exits it. ``os._exit`` is used so the
+        child never unwinds into the parent's cleanup code.
+        """
+
+        rc = 1
+        # The parent's ends of the other children are of no use here.
+        self.close_channels()
+        forget_parent()
+
+        try:
+            rc = profile_call(
+                self.profile_dir,
+                f'{group}-{host["host"]}',
+                stream_host,
+                s_conn, group, host, self.master_key
+            )
+            s_conn.close()
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(rc)
+
+    def receive_result(self, key) -> dict:
+        """
+        Reads what is available on the connection of **key**. Once the
+        child's result is complete, it is handled and returned, ``None`` is
+        returned otherwise.
+
+        A child that closes its connection without a result is collected as
+        failed, naming the phase it reported last.
+        """
+
+        conn = key.fileobj
+        channel = key.data
+
+        try:
+            data_bin = conn.recv(Const.BUFF_SIZE)
+        except BlockingIOError:
+            return None
+
+        if data_bin != b"":
+            channel.reader.feed(data_bin)
+
+            try:
+                for msg_type, obj in channel.reader.frames():
+                    if msg_type == MSG_PROGRESS:
+                        channel.phase = obj["phase"]
+                    elif msg_type == MSG_OUTPUT:
+                        channel.output[obj["cmds"]] = obj["lines"]
+                    else:
+                        channel.result = obj
+            except IpcError as e:
+                raise EngineError(
+                    f"Invalid data received from child: {e}"
+                ) from e
+
+            if channel.result is None:
+                return None
+
+        self.selector.unregister(conn)
+        conn.close()
+
+        if channel.result is None:
+            channel.result = failed_output(
+                channel.group,
+                channel.host,
+                f"Worker exited during {channel.phase} without a result."
+            )
+
+        data = channel.result
+        data["output"].update(channel.output)
+        attach_config(data, channel.host)
+
+        self.handle_result(data)
+
+        return data
+
+    def reap_children(self, block=False) -> None:
+        """
+        Collects exit statuses of finished children so they do not linger as
+        zombies. Waits for all of them if **block** is ``True``.
+        """
+
+        options = 0 if block else os.WNOHANG
+
+        while True:
+            try:
+                pid, status = os.waitpid(-1, options)
+            except ChildProcessError:
+                break
+
+            if pid == 0:
+                break
+
+class DaemonEngine(ForkEngine):
+    """
+    Hands every host to the session daemon (see :py:mod:`daemon`) instead
+    of forking. Each host gets its own connection to the daemon's UNIX
+    socket, which answers with the same frames as a forked child, so
+    results are received exactly like those of :py:class:`ForkEngine`.
+
+    The daemon decrypts the passwords with its own master key.
+
+    Attributes:
+        socket_path (str): The socket of the daemon.
+    """
+
+    def __init__(self, coll, **kwargs) -> None:
+        super().__init__(coll, **kwargs)
+        self.socket_path = None
+
+    def start(self) -> None:
+        super().start()
+        self.socket_path = f"{Const.CHOME_ABS_PATH}/{Const.DAEMON_SOCKET}"
+
+    def submit(self, group, host) -> None:
+        # Settings are sent flat, the daemon has no configuration.
+        flat = lambda h: {**h, "settings": dict(h["settings"])}
+        job = {
+            "group": group,
+            "host": flat(host)
+        }
+
+        if host.get("coalesced"):
+            job["host"]["coalesced"] = [
+                {"group": c["group"], "host": flat(c["host"])}
+                for c in host["coalesced"]
+            ]
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+        try:
+            conn.connect(self.socket_path)
+            send_frame(conn, MSG_JOB, job)
+        except (OSError, TypeError, ValueError) as e:
+            conn.close()
+            raise EngineError(
+                f"Cannot hand {host['host']} to the daemon at " +
+                f"{self.socket_path}: {e}\nIs conquers --daemon running?"
+            ) from e
+
+        conn.setblocking(False)
+        self.selector.register(
+            conn,
+            selectors.EVENT_READ,
+            ChildChannel(group, host)
+        )
+
+class PoolEngine(Engine):
+    """
+    Base class for engines based on a
+    `concurrent.futures <https://docs.python.org/3/library/concurrent.futures.html>`_
+    executor. The executor is created once and reused for all groups.
+
+    Attributes:
+        executor_class (type): The executor class to use.
+        executor_options (dict): Additional arguments for the executor.
+        executor (concurrent.futures.Executor): The executor in use.
+        pending (dict): Maps running futures to ``(group, host)``.
+    """
+
+    executor_class = None
+    executor_options = {}
+
+    def __init__(self, coll, **kwargs) -> None:
+        super().__init__(coll, **kwargs)
+        self.executor = None
+        self.pending = {}
+
+    def start(self) -> None:
+        self.executor = self.executor_class(
+            max_workers=self.max_workers,
+            **self.executor_options
+        )
+
+    def stop(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def submit(self, group, host) -> None:
+        future = self.executor.submit(
+            profile_call,
+            self.profile_dir,
+            f'{group}-{host["host"]}',
+            run_host,
+            group, host, None, self.master_key
+        )
+        self.pending[future] = (group, host)
+
+    def wait_results(self) -> list:
+        done, _ = wait(self.pending, return_when=FIRST_COMPLETED)
+        groups = []
+
+        for future in done:
+            group, host = self.pending.pop(future)
+
+            try:
+                data = future.result()
+                # Use the parent's host object with its shared settings
+                # instead of the copy returned by a worker process.
+                attach_config(data, host)
+            except Exception as e:
+                data = failed_output(group, host, e)
+
+            self.handle_result(data)
+            groups.append(group)
+
+        return groups
+
+class ProcessPoolEngine(PoolEngine):
+    """
+    Runs hosts in a reusable pool of worker processes.
+    """
+
+    executor_class = ProcessPoolExecutor
+    executor_options = {"initializer": forget_parent}
+
+class ThreadEngine(PoolEngine):
+    """
+    Runs hosts in a pool of threads. Netmiko sessions are I/O-bound, so
+    this allows many concurrent sessions in a single process.
+    """
+
+    executor_class = ThreadPoolExecutor
+
+class AsyncioEngine(Engine):
+    """
+    Runs hosts as asyncio tasks. The blocking netmiko calls are offloaded to
+    a thread pool, results are handled in the event loop in the order they
+    complete.
+
+    Attributes:
+        executor (concurrent.futures.ThreadPoolExecutor):
+            Runs the blocking calls.
+    """
+
+    def __init__(self, coll, **kwargs) -> None:
+        super().__init__(coll, **kwargs)
+        self.executor = None
+
+    def start(self) -> None:
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+    def stop(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def run(self, scheduler) -> None:
+        asyncio.run(self.__run(scheduler))
+
+    async def __run(self, scheduler) -> None:
+        tasks = set()
+
+        while True:
+            while (job := scheduler.next_job()) is not None:
+                obj, host = job
+
+                if self.skip_host(obj["group"], host):
+                    scheduler.done(obj["group"])
+                    continue
+
+                tasks.add(
+                    asyncio.create_task(self.__run_host(obj["group"], host))
+                )
+
+            if scheduler.idle():
+                break
+
+            done, tasks = await asyncio.wait(
+                tasks, return_when=asyncio.FIRST_COMPLETED
+            )
+
+            for task in done:
+                scheduler.done(task.result())
+
+    async def __run_host(self, group, host) -> str:
+        loop = asyncio.get_running_loop()
+
+        try:
+            data = await loop.run_in_executor(
+                self.executor,
+                profile_call,
+                self.profile_dir,
+                f'{group}-{host["host"]}',
+                run_host,
+                group, host, None, self.master_key
+            )
+        except Exception as e:
+            data = failed_output(group, host, e)
+
+        self.handle_result(data)
+
+        return group
+
+ENGINES = {
+    "fork": ForkEngine,
+    "process-pool": ProcessPoolEngine,
+    "threads": ThreadEngine,
+    "asyncio": AsyncioEngine,
+    "daemon": DaemonEngine
+}
+"""
+Maps the values of ``--engine`` to engine classes.
+"""
@@ -0,0 +1,294 @@
+"""
+Inventory sources that stream hosts into a group from outside the
+configuration file.
+
+A group gets its hosts from an ``inventory`` section in addition to, or
+instead of, ``hosts``:
+
+.. code-block:: yaml
+
+    access:
+      device_type: "cisco_ios"
+      inventory:
+        type: csv                   # csv or sqlite
+        path: ~/cmdb/export.csv
+        host_column: hostname       # Default is host
+        table: devices              # sqlite only
+        filter:                     # Column -> pattern or list of patterns
+          role: access
+          site: ["ber*", "muc*"]
+        settings_columns:           # Columns that override settings per host
+          - device_type
+
+Rows are read lazily while the scheduler hands out hosts, so neither
+startup time nor memory grows with the size of the inventory.
+
+Filter patterns are matched case-sensitively against the text of a column
+with shell-style wildcards (``*``, ``?``, ``[...]``), a row must match every
+column of the filter. Settings from CSV files are read like scalars of the
+configuration file, so ``false`` is a boolean and ``30`` a number. SQLite
+values keep their type.
+"""
+import csv
+import sqlite3
+from functools import lru_cache
+from fnmatch import fnmatchcase
+from pathlib import Path
+import yaml
+# Use libyaml's C loader if PyYAML was built with it.
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+class InventoryError(Exception):
+    pass
+
+class Inventory:
+    """
+    Base class of all inventory sources.
+
+    The file and the columns are checked when the inventory is created,
+    the rows are only read when iterating over
+    :py:meth:`~inventory.Inventory.hosts`.
+
+    Attributes:
+        path (str): Path to the inventory file.
+        host_column (str): Column holding the host name.
+        filter (dict): Column -> list of patterns.
+        settings_columns (list): Columns whose non-empty values override
+            the settings of a host.
+
+    Args:
+        settings (dict): The ``inventory`` section of a group.
+    """
+
+    def __init__(self, settings) -> None:
+        if not settings.get("path"):
+            raise InventoryError("Inventory without path.")
+
+        self.path = str(settings["path"]).replace("~", str(Path.home()))
+        self.host_column = settings.get("host_column", "host")
+        self.filter = {}
+        self.settings_columns = list(settings.get("settings_columns") or [])
+
+        for column, patterns in (settings.get("filter") or {}).items():
+            if not isinstance(patterns, list):
+                patterns = [patterns]
+
+            self.filter[column] = [str(p) for p in patterns]
+
+        if not Path(self.path).is_file():
+            raise InventoryError(f"File {self.path} does not exist.")
+
+        self.check_columns(self.columns())
+
+    def check_columns(self, available) -> None:
+        """
+        Raises :py:class:`~inventory.InventoryError` if a configured column
+        is not in **available**.
+        """
+
+        needed = [self.host_column, *self.filter, *self.settings_columns]
+        missing = [c for c in needed if c not in available]
+
+        if missing:
+            raise InventoryError(
+                f"Inventory {self.path} has no column(s) {', '.join(missing)}."
+            )
+
+    def columns(self) -> list:
+        """
+        Returns the column names of the inventory.
+        """
+
+        raise NotImplementedError
+
+    def rows(self):
+        """
+        Yields every row that matches :py:attr:`~inventory.Inventory.filter`
+        as a dictionary.
+        """
+
+        raise NotImplementedError
+
+    def hosts(self):
+        """
+        Yields ``(host name, settings overrides)`` per matching row. Rows
+        without a host name are skipped.
+        """
+
+        for row in self.rows():
+            name = row[self.host_column]
+
+            if name is None or name == "":
+                continue
+
+            overrides = {
+                c: self.setting(row[c]) for c in self.settings_columns
+                if row[c] is not None and row[c] != ""
+            }
+
+            yield str(name), overrides
+
+    def setting(self, value):
+        """
+        Returns the setting a non-empty **value** of a settings column
+        stands for.
+        """
+
+        return value
+
+class CsvInventory(Inventory):
+    """
+    Reads hosts from a CSV file with a header line.
+    """
+
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def setting(value):
+        # Cells repeat a lot, e.g. the device type, so each is parsed once.
+        try:
+            parsed = yaml.load(value, Loader=SafeLoader)
+        except yaml.YAMLError:
+            return value
+
+        # Only scalars, "a: b" stays text.
+        if isinstance(parsed, (dict, list)) or parsed is None:
+            return value
+
+        return parsed
+
+    def columns(self) -> list:
+        try:
+            with open(self.path, "r", newline="") as fh:
+                return next(csv.reader(fh), [])
+        except (OSError, csv.Error) as e:
+            raise InventoryError(e) from e
+
+    def rows(self):
+        try:
+            with open(self.path, "r", newline="") as fh:
+                for row in csv.DictReader(fh):
+                    if self.matches(row):
+                        yield row
+        except (OSError, csv.Error) as e:
+            raise InventoryError(e) from e
+
+    def matches(self, row) -> bool:
+        """
+        Returns ``True`` if **row** matches every column of
+        :py:attr:`~inventory.Inventory.filter`.
+        """
+
+        for column, patterns in self.filter.items():
+            value = row[column] or ""
+
+            if not any(fnmatchcase(value, p) for p in patterns):
+                return False
+
+        return True
+
+class SqliteInventory(Inventory):
+    """
+    Reads hosts from a table of a SQLite database. The database is opened
+    read-only and the filter becomes the ``WHERE`` clause, so only matching
+    rows leave SQLite.
+
+    Attributes:
+        table (str): The table holding the hosts, ``table`` in the
+            inventory section.
+    """
+
+    def __init__(self, settings) -> None:
+        if not settings.get("table"):
+            raise InventoryError("SQLite inventory without table.")
+
+        self.table = settings["table"]
+        super().__init__(settings)
+
+    @staticmethod
+    def quote(name) -> str:
+        """
+        Quotes **name** as an SQL identifier.
+        """
+
+        return '"' + str(name).replace('"', '""') + '"'
+
+    def connect(self):
+        """
+        Returns a read-only connection to the database.
+        """
+
+        try:
+            return sqlite3.connect(
+                Path(self.path).resolve().as_uri() + "?mode=ro",
+                uri=True
+            )
+        except sqlite3.Error as e:
+            raise InventoryError(e) from e
+
+    def columns(self) -> list:
+        conn = self.connect()
+
+        try:
+            info = conn.execute(
+                f"PRAGMA table_info({self.quote(self.table)})"
+            ).fetchall()
+        except sqlite3.Error as e:
+            raise InventoryError(e) from e
+        finally:
+            conn.close()
+
+        if not info:
+            raise InventoryError(f"Inventory {self.path} has no table {self.table}.")
+
+        return [i[1] for i in info]
+
+    def rows(self):
+        columns = list(dict.fromkeys([self.host_column, *self.settings_columns]))
+        where = []
+        params = []
+
+        for column, patterns in self.filter.items():
+            where.append("(" + " OR ".join(
+                [f"CAST({self.quote(column)} AS TEXT) GLOB ?"] * len(patterns)
+            ) + ")")
+            params += patterns
+
+        query = f"SELECT {', '.join(self.quote(c) for c in columns)} " + \
+                f"FROM {self.quote(self.table)}"
+
+        if where:
+            query += " WHERE " + " AND ".join(where)
+
+        conn = self.connect()
+
+        try:
+            for values in conn.execute(query, params):
+                yield dict(zip(columns, values))
+        except sqlite3.Error as e:
+            raise InventoryError(e) from e
+        finally:
+            conn.close()
+
+INVENTORIES = {
+    "csv": CsvInventory,
+    "sqlite": SqliteInventory
+}
+
+def load_inventory(settings) -> Inventory:
+    """
+    Returns the inventory described by **settings**, the ``inventory``
+    section of a group.
+    """
+
+    if not isinstance(settings, dict):
+        raise InventoryError("inventory must be a mapping.")
+
+    if settings.get("type") not in INVENTORIES:
+        raise InventoryError(
+            "Valid inventory types are: {}".format(', '.join(INVENTORIES))
+        )
+
+    return INVENTORIES[settings["type"]](settings)
@@ -0,0 +1,150 @@
+"""
+Framed messages exchanged between the forked children and the parent, and
+between the session daemon (see :py:mod:`daemon`) and its clients.
+
+A connection carries any number of frames. Every frame is a fixed header
+followed by the payload:
+
+    * 4 bytes: payload length, unsigned big-endian
+    * 1 byte: message type, one of :py:data:`MSG_PROGRESS`,
+      :py:data:`MSG_OUTPUT`, :py:data:`MSG_RESULT` or :py:data:`MSG_JOB`
+    * payload: utf-8 encoded json
+
+The payload is only decoded once the whole frame has arrived, so a chunk
+boundary can never split a multibyte character.
+"""
+import json
+import struct
+
+class IpcError(Exception):
+    pass
+
+HEADER = struct.Struct(">IB")
+"""
+Frame header: payload length and message type.
+"""
+
+MSG_PROGRESS = 1
+"""
+The child entered a new phase, e.g. ``{"phase": "connect", ...}``.
+"""
+
+MSG_OUTPUT = 2
+"""
+Output of one command set, e.g. ``{"cmds": "cmds_before", "lines": [...]}``.
+"""
+
+MSG_RESULT = 3
+"""
+The final output structure of a host. Always the last frame.
+"""
+
+MSG_JOB = 4
+"""
+A host to run, sent to the daemon, e.g. ``{"group": "g", "host": {...}}``.
+The daemon answers like a forked child.
+"""
+
+MSG_TYPES = (MSG_PROGRESS, MSG_OUTPUT, MSG_RESULT, MSG_JOB)
+
+def encode_frame(msg_type, obj) -> tuple:
+    """
+    Returns header and payload of a frame containing **obj**.
+    """
+
+    payload = json.dumps(obj).encode()
+
+    return HEADER.pack(len(payload), msg_type), payload
+
+def send_frame(sock, msg_type, obj) -> None:
+    """
+    Sends **obj** as one frame of **msg_type** on the blocking socket
+    **sock**.
+    """
+
+    header, payload = encode_frame(msg_type, obj)
+    sock.sendall(header)
+    sock.sendall(payload)
+
+def recv_frame(sock) -> tuple:
+    """
+    Receives exactly one frame from the blocking socket **sock** and
+    returns ``(message type, object)``. Raises :py:class:`IpcError` if the
+    connection is closed before.
+    """
+
+    reader = FrameReader()
+
+    while True:
+        for frame in reader.frames():
+            return frame
+
+        data = sock.recv(65536)
+
+        if data == b"":
+            raise IpcError("Connection closed before a frame was complete.")
+
+        reader.feed(data)
+
+class FrameReader:
+    """
+    Reassembles frames from the bytes received on one connection.
+
+    All bytes go into a single ``bytearray``. Complete frames are decoded
+    from a ``memoryview`` of it, consumed bytes are dropped from the front
+    only once they make up more than half of the buffer.
+
+    Attributes:
+        buffer (bytearray): Received bytes.
+        offset (int): Start of the first frame that was not returned yet.
+    """
+
+    def __init__(self) -> None:
+        self.buffer = bytearray()
+        self.offset = 0
+
+    def feed(self, data) -> None:
+        """
+        Appends received **data** to the buffer.
+        """
+
+        self.buffer += data
+
+    def frames(self):
+        """
+        Yields ``(message type, object)`` for every complete frame in the
+        buffer.
+        """
+
+        while len(self.buffer) - self.offset >= HEADER.size:
+            length, msg_type = HEADER.unpack_from(self.buffer, self.offset)
+            start = self.offset + HEADER.size
+            end = start + length
+
+            if len(self.buffer) < end:
+                break
+
+            if msg_type not in MSG_TYPES:
+                raise IpcError(f"Unknown message type {msg_type}.")
+
+            with memoryview(self.buffer) as view:
+                try:
+                    obj = json.loads(str(view[start:end], "utf-8"))
+                except (json.decoder.JSONDecodeError, UnicodeDecodeError) as e:
+                    raise IpcError(e) from e
+
+            self.offset = end
+
+            yield msg_type, obj
+
+        # Drop consumed bytes.
+        if self.offset > len(self.buffer) // 2:
+            del self.buffer[:self.offset]
+            self.offset = 0
+
+    def pending(self) -> bool:
+        """
+        Returns ``True`` if the buffer holds an incomplete frame.
+        """
+
+        return len(self.buffer) > self.offset
@@ -0,0 +1,336 @@
+"""
+Metrics of a run for monitoring, enabled with ``--metrics DIR``.
+
+At the end of the run two files are written to ``DIR``:
+
+    * ``conquers.prom``: an `OpenMetrics
+      <https://github.com/OpenObservability/OpenMetrics>`_ text file that
+      node exporter's textfile collector can pick up.
+    * ``metrics.json``: the same numbers as a JSON document.
+
+Both are replaced atomically, so a collector never reads half a file. All
+values describe the last run, counts are therefore gauges.
+
+Metrics:
+    * number of hosts that succeeded, failed and were skipped, per group
+      (attempted hosts are those that succeeded or failed)
+    * histograms of the duration of a host per group and per device type
+    * histogram of the connect latency
+    * bytes of output per group
+    * highest number of hosts in flight at the same time
+    * duration of the run, CPU time and peak RSS of the parent, CPU time of
+      the forked workers
+"""
+import os
+import json
+import time
+import bisect
+import resource
+
+class Histogram:
+    """
+    Counts observations in buckets with upper bounds.
+
+    Attributes:
+        buckets (tuple): Upper bounds, ``+Inf`` is implied.
+        counts (list): Observations per bucket, the last one is ``+Inf``.
+        sum (float): Sum of all observations.
+        count (int): Number of observations.
+    """
+
+    def __init__(self, buckets) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list:
+        """
+        Returns ``(upper bound, observations up to it)`` per bucket, the
+        last upper bound is ``"+Inf"``.
+        """
+
+        result = []
+        total = 0
+
+        for bound, count in zip([*self.buckets, "+Inf"], self.counts):
+            total += count
+            result.append((bound, total))
+
+        return result
+
+    def to_dict(self) -> dict:
+        return {
+            "buckets": {str(b): c for b, c in self.cumulative()},
+            "sum": round(self.sum, 6),
+            "count": self.count
+        }
+
+class RunMetrics:
+    """
+    Collects the metrics of a run from the results as they arrive.
+    :py:meth:`observe` is registered in :py:attr:`engines.Engine.observers`.
+
+    Attributes:
+        started (float): Start of the run, seconds since the epoch.
+        hosts (dict): Group -> result (``succeeded``, ``failed``,
+            ``skipped``) -> number of hosts.
+        duration (dict): Group -> :py:class:`Histogram` of host durations.
+        duration_by_device (dict): Device type -> :py:class:`Histogram` of
+            host durations.
+        connect (:py:class:`Histogram`): Connect latencies.
+        output_bytes (dict): Group -> bytes of output.
+        peak_concurrency (int): Highest number of hosts in flight.
+        finished (float): End of the run, set by :py:meth:`finish`.
+    """
+
+    DURATION_BUCKETS = (0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600)
+    """
+    Upper bounds in seconds for the duration of a host.
+    """
+
+    CONNECT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+    """
+    Upper bounds in seconds for the connect latency.
+    """
+
+    RESULTS = ("succeeded", "failed", "skipped")
+
+    def __init__(self) -> None:
+        self.started = time.time()
+        self.hosts = {}
+        self.duration = {}
+        self.duration_by_device = {}
+        self.connect = Histogram(self.CONNECT_BUCKETS)
+        self.output_bytes = {}
+        self.peak_concurrency = 0
+        self.finished = None
+
+    def observe(self, data) -> None:
+        """
+        Adds the result **data** of a host.
+        """
+
+        group = data["group"]
+        timings = data.get("timings", {})
+
+        if data["message"] == "ok":
+            result = "succeeded"
+        elif data["message"] == "skipped":
+            result = "skipped"
+        else:
+            result = "failed"
+
+        counts = self.hosts.setdefault(
+            group, dict.fromkeys(self.RESULTS, 0)
+        )
+        counts[result] += 1
+
+        if result == "skipped":
+            return
+
+        if timings.get("total") is not None:
+            device = data["config"]["settings"].get("device_type", "unknown")
+
+            self.duration.setdefault(
+                group, Histogram(self.DURATION_BUCKETS)
+            ).observe(timings["total"])
+            self.duration_by_device.setdefault(
+                device, Histogram(self.DURATION_BUCKETS)
+            ).observe(timings["total"])
+
+        if timings.get("connect") is not None:
+            self.connect.observe(timings["connect"])
+
+        self.output_bytes[group] = self.output_bytes.get(group, 0) + sum(
+            len(line.encode()) + 1
+            for lines in data["output"].values() for line in lines
+        )
+
+    def finish(self, schedulers) -> None:
+        """
+        Ends the run and takes the peak concurrency of **schedulers**.
+        """
+
+        self.finished = time.time()
+        self.peak_concurrency = max(
+            [s.peak_in_flight for s in schedulers], default=0
+        )
+
+    def to_dict(self) -> dict:
+        """
+        Returns the metrics as the JSON document.
+        """
+
+        parent = resource.getrusage(resource.RUSAGE_SELF)
+        workers = resource.getrusage(resource.RUSAGE_CHILDREN)
+        totals = dict.fromkeys(self.RESULTS, 0)
+
+        for counts in self.hosts.values():
+            for result in self.RESULTS:
+                totals[result] += counts[result]
+
+        return {
+            "started": self.started,
+            "duration_seconds": round(self.finished - self.started, 6),
+            "hosts": {
+                "attempted": totals["succeeded"] + totals["failed"],
+                **totals
+            },
+            "groups": {
+                group: {
+                    "hosts": counts,
+                    "duration_seconds": self.duration[group].to_dict()
+                        if group in self.duration else None,
+                    "output_bytes": self.output_bytes.get(group, 0)
+                }
+                for group, counts in self.hosts.items()
+            },
+            "device_types": {
+                device: {"duration_seconds": histogram.to_dict()}
+                for device, histogram in self.duration_by_device.items()
+            },
+            "connect_seconds": self.connect.to_dict(),
+            "output_bytes": sum(self.output_bytes.values()),
+            "peak_concurrency": self.peak_concurrency,
+            "parent": {
+                "cpu_seconds": round(parent.ru_utime + parent.ru_stime, 6),
+                # Linux reports kilobytes.
+                "max_rss_bytes": parent.ru_maxrss * 1024
+            },
+            "workers": {
+                "cpu_seconds": round(workers.ru_utime + workers.ru_stime, 6)
+            }
+        }
+
+    @staticmethod
+    def label(value) -> str:
+        """
+        Escapes **value** for a label of the text format.
+        """
+
+        return str(value).replace("\\", "\\\\").replace("\n", "\\n")\
+                .replace('"', '\\"')
+
+    def to_openmetrics(self, doc) -> str:
+        """
+        Returns **doc** (see :py:meth:`to_dict`) in the OpenMetrics text
+        format.
+        """
+
+        lines = []
+
+        def metric(name, kind, help, samples):
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+
+            for suffix, labels, value in samples:
+                labels = ",".join(
+                    f'{k}="{self.label(v)}"' for k, v in labels.items()
+                )
+                labels = f"{{{labels}}}" if labels else ""
+                lines.append(f"{name}{suffix}{labels} {value}")
+
+        def histogram(name, help, label_name, histograms):
+            samples = []
+
+            for label_value, h in histograms.items():
+                labels = {label_name: label_value} if label_name else {}
+
+                for bound, count in h.cumulative():
+                    samples.append(("_bucket", {**labels, "le": bound}, count))
+
+                samples.append(("_sum", labels, round(h.sum, 6)))
+                samples.append(("_count", labels, h.count))
+
+            metric(name, "histogram", help, samples)
+
+        metric(
+            "conquers_hosts", "gauge",
+            "Hosts of the last run by group and result.",
+            [
+                ("", {"group": group, "result": result}, counts[result])
+                for group, counts in self.hosts.items()
+                for result in self.RESULTS
+            ]
+        )
+        histogram(
+            "conquers_host_duration_seconds",
+            "Duration of a host by group.",
+            "group", self.duration
+        )
+        histogram(
+            "conquers_device_type_duration_seconds",
+            "Duration of a host by device type.",
+            "device_type", self.duration_by_device
+        )
+        histogram(
+            "conquers_connect_seconds",
+            "Time to connect to a switch.",
+            None, {None: self.connect}
+        )
+        metric(
+            "conquers_output_bytes", "gauge",
+            "Bytes of output of the last run by group.",
+            [
+                ("", {"group": group}, count)
+                for group, count in self.output_bytes.items()
+            ]
+        )
+        metric(
+            "conquers_peak_concurrency", "gauge",
+            "Highest number of hosts in flight at the same time.",
+            [("", {}, doc["peak_concurrency"])]
+        )
+        metric(
+            "conquers_run_duration_seconds", "gauge",
+            "Duration of the last run.",
+            [("", {}, doc["duration_seconds"])]
+        )
+        metric(
+            "conquers_run_timestamp_seconds", "gauge",
+            "Start of the last run.",
+            [("", {}, round(doc["started"], 3))]
+        )
+        metric(
+            "conquers_cpu_seconds", "gauge",
+            "CPU time of the last run by process.",
+            [
+                ("", {"process": "parent"}, doc["parent"]["cpu_seconds"]),
+                ("", {"process": "workers"}, doc["workers"]["cpu_seconds"])
+            ]
+        )
+        metric(
+            "conquers_parent_max_rss_bytes", "gauge",
+            "Peak resident memory of the parent.",
+            [("", {}, doc["parent"]["max_rss_bytes"])]
+        )
+        lines.append("# EOF")
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, directory) -> None:
+        """
+        Writes ``conquers.prom`` and ``metrics.json`` to **directory**.
+        """
+
+        directory = directory.replace("~", os.path.expanduser("~"))
+        os.makedirs(directory, exist_ok=True)
+        doc = self.to_dict()
+
+        for name, content in (
+            ("conquers.prom", self.to_openmetrics(doc)),
+            ("metrics.json", json.dumps(doc, indent=2) + "\n")
+        ):
+            path = os.path.join(directory, name)
+            temp_file = f"{path}.{os.getpid()}.tmp"
+
+            with open(temp_file, "w", encoding="utf-8") as fh:
+                fh.write(content)
+
+            os.replace(temp_file, path)
@@ -0,0 +1,192 @@
+"""
+Profiling of a run, enabled with ``--profile DIR``.
+
+The parent is profiled with `cProfile
+<https://docs.python.org/3/library/profile.html>`_ for the whole run, every
+host a worker runs gets its own profile. Once the run is over, all of them
+are merged into one aggregate. ``DIR`` then holds:
+
+    * ``parent.prof``: the parent.
+    * ``worker-<group>-<host>-<pid>-<n>.prof``: one per host.
+    * ``aggregate.prof``: parent and workers merged.
+    * ``aggregate.txt``: the most expensive functions of the aggregate.
+
+With ``--profile-memory`` the parent's memory is traced with `tracemalloc
+<https://docs.python.org/3/library/tracemalloc.html>`_ as well and
+snapshots are written at the start, at the peak and at the end of the run
+(``memory-start.snapshot``, ``memory-peak.snapshot``,
+``memory-end.snapshot``), summarized in ``memory.txt``.
+
+All files can be inspected with ``pstats`` and ``tracemalloc`` or tools
+like snakeviz.
+"""
+import os
+import re
+import sys
+import glob
+import pstats
+import cProfile
+import itertools
+import threading
+import tracemalloc
+
+# Numbers the profiles of a worker process.
+_counter = itertools.count()
+_counter_lock = threading.Lock()
+
+def profile_call(profile_dir, name, func, *args):
+    """
+    Returns ``func(*args)``. If **profile_dir** is not ``None``, the call is
+    profiled and the stats are written to **profile_dir** under a file name
+    derived from **name**, e.g. the group and the host.
+
+    Profiles are per thread, so workers of the thread based engines are
+    profiled on their own, too.
+    """
+
+    if profile_dir is None:
+        return func(*args)
+
+    with _counter_lock:
+        n = next(_counter)
+
+    name = re.sub(r"[^\w.-]", "_", name)
+    profiler = cProfile.Profile()
+
+    try:
+        return profiler.runcall(func, *args)
+    finally:
+        profiler.dump_stats(
+            os.path.join(profile_dir, f"worker-{name}-{os.getpid()}-{n}.prof")
+        )
+
+def forget_parent() -> None:
+    """
+    Stops profiling and memory tracing a forked worker inherited from the
+    parent. The parent writes its own stats, the worker would only be slowed
+    down.
+    """
+
+    sys.setprofile(None)
+
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+class Profiler:
+    """
+    Profiles the parent and merges its stats with those of the workers.
+
+    Attributes:
+        directory (str): Where all files are written.
+        trace_memory (bool): Take tracemalloc snapshots, too.
+        profiler (cProfile.Profile): Profiles the parent.
+        snapshots (dict): ``start``, ``peak`` and ``end`` snapshot.
+        peak (int): Traced memory in bytes when the peak snapshot was taken.
+    """
+
+    TOP = 40
+    """
+    Number of entries in the text summaries.
+    """
+
+    def __init__(self, directory, trace_memory=False) -> None:
+        self.directory = directory.replace("~", os.path.expanduser("~"))
+        self.trace_memory = trace_memory
+        self.profiler = cProfile.Profile()
+        self.snapshots = {}
+        self.peak = 0
+
+    def start(self) -> None:
+        """
+        Creates the directory and starts profiling the parent.
+        """
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Leftovers of an earlier run would end up in the aggregate.
+        for path in glob.glob(os.path.join(self.directory, "worker-*.prof")):
+            os.unlink(path)
+
+        if self.trace_memory:
+            tracemalloc.start()
+            self.snapshots["start"] = tracemalloc.take_snapshot()
+
+        self.profiler.enable()
+
+    def sample(self, *args) -> None:
+        """
+        Takes a new peak snapshot if the parent uses at least 10% more
+        memory than at the last one. Called after every result, see
+        :py:attr:`engines.Engine.observers`.
+        """
+
+        if not self.trace_memory:
+            return
+
+        current, peak = tracemalloc.get_traced_memory()
+
+        if current > self.peak * 1.1:
+            self.snapshots["peak"] = tracemalloc.take_snapshot()
+            self.peak = current
+
+    def stop(self) -> None:
+        """
+        Stops profiling, writes the stats of the parent and the aggregate
+        and, if memory was traced, the snapshots.
+        """
+
+        self.profiler.disable()
+
+        parent = os.path.join(self.directory, "parent.prof")
+        self.profiler.dump_stats(parent)
+
+        workers = sorted(
+            glob.glob(os.path.join(self.directory, "worker-*.prof"))
+        )
+        stats = pstats.Stats(parent)
+
+        for path in workers:
+            stats.add(path)
+
+        stats.dump_stats(os.path.join(self.directory, "aggregate.prof"))
+
+        with open(os.path.join(self.directory, "aggregate.txt"), "w") as fh:
+            fh.write(
+                f"Aggregate of the parent and {len(workers)} worker profiles.\n"
+            )
+            stats.stream = fh
+
+            for key in ("tottime", "cumulative"):
+                stats.sort_stats(key).print_stats(self.TOP)
+
+        if self.trace_memory:
+            self.write_snapshots()
+
+    def write_snapshots(self) -> None:
+        """
+        Writes the snapshots and ``memory.txt``, which lists where the
+        memory at the peak and at the end was allocated.
+        """
+
+        current, peak = tracemalloc.get_traced_memory()
+        self.snapshots["end"] = tracemalloc.take_snapshot()
+        self.snapshots.setdefault("peak", self.snapshots["end"])
+        tracemalloc.stop()
+
+        for name, snapshot in self.snapshots.items():
+            snapshot.dump(
+                os.path.join(self.directory, f"memory-{name}.snapshot")
+            )
+
+        with open(os.path.join(self.directory, "memory.txt"), "w") as fh:
+            fh.write(f"Traced memory at the end: {current} bytes\n")
+            fh.write(f"Highest traced memory: {peak} bytes\n")
+
+            for name in ("peak", "end"):
+                fh.write(f"\nLargest growth from start to {name}:\n")
+                diff = self.snapshots[name].compare_to(
+                    self.snapshots["start"], "lineno"
+                )
+
+                for stat in diff[:self.TOP]:
+                    fh.write(f"{stat}\n")
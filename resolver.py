@@ -0,0 +1,209 @@
+"""
+Resolves host names in the parent before their hosts are handed out.
+
+Names are resolved concurrently, a chunk of hosts ahead of the scheduler,
+so hosts streamed from an inventory are still read lazily. The next chunk
+is resolved while the current one is handed out and a host only waits for
+its own lookup, so a slow name does not hold up the scheduler for a whole
+chunk. All groups share one pool of lookup threads. Results are kept in a
+cache file in ``~/.conquers`` for ``dns_ttl`` seconds (see ``defaults`` in
+the configuration), so unchanged names are not resolved again in the next
+run. Failed lookups are never cached.
+"""
+import os
+import json
+import time
+import socket
+import ipaddress
+import itertools
+from pathlib import Path
+from concurrent.futures import\
+        ThreadPoolExecutor,\
+        Future
+
+class Resolver:
+    """
+    Attributes:
+        cache_file (str): Path to the cache file, ``None`` disables the
+            cache file.
+        ttl (int): Seconds a resolved address is valid. ``0`` disables the
+            cache.
+        workers (int): Number of lookups running at the same time, for
+            all streams together.
+        chunk_size (int): Number of hosts resolved ahead of the scheduler.
+        cache (dict): Host name -> ``[address, expiry timestamp]``.
+        changed (bool): ``True`` if the cache has to be saved.
+        executor (concurrent.futures.ThreadPoolExecutor): Runs the lookups
+            of all streams, created on first use.
+    """
+
+    def __init__(self, cache_file=None, ttl=300, workers=32, chunk_size=256):
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.cache = {}
+        self.changed = False
+        self.executor = None
+
+    def load(self) -> None:
+        """
+        Reads the cache file and drops expired entries. A missing or broken
+        cache file is treated as empty.
+        """
+
+        if self.cache_file is None or not self.ttl:
+            return
+
+        try:
+            with open(self.cache_file, "r") as fh:
+                cache = json.load(fh)
+        except (OSError, ValueError):
+            return
+
+        if not isinstance(cache, dict):
+            return
+
+        now = time.time()
+        self.cache = {
+            name: entry for name, entry in cache.items()
+            if isinstance(entry, list) and len(entry) == 2 and entry[1] > now
+        }
+        self.changed = len(self.cache) != len(cache)
+
+    def save(self) -> None:
+        """
+        Writes the cache file if it changed. The cache is only an
+        optimization, failing to write it is not an error.
+        """
+
+        if self.cache_file is None or not self.ttl or not self.changed:
+            return
+
+        temp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+
+        try:
+            Path(self.cache_file).parent.mkdir(parents=True, exist_ok=True)
+
+            with open(temp_file, "w") as fh:
+                json.dump(self.cache, fh)
+
+            os.replace(temp_file, self.cache_file)
+            self.changed = False
+        except OSError:
+            if Path(temp_file).exists():
+                os.unlink(temp_file)
+
+    def close(self) -> None:
+        """
+        Stops the lookup threads. Lookups that did not start yet are
+        cancelled.
+        """
+
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    def lookup(self, name) -> str:
+        """
+        Returns the cached address of **name** or ``None``.
+        """
+
+        try:
+            # Addresses need no lookup.
+            ipaddress.ip_address(name)
+            return name
+        except ValueError:
+            pass
+
+        entry = self.cache.get(name)
+
+        if entry is not None and entry[1] > time.time():
+            return entry[0]
+
+        return None
+
+    @staticmethod
+    def gethostbyname(name) -> tuple:
+        """
+        Resolves **name**. Returns ``(address, error, seconds)`` where
+        exactly one of address and error is ``None``.
+        """
+
+        start = time.perf_counter()
+
+        try:
+            address, error = socket.gethostbyname(name), None
+        except (OSError, UnicodeError) as e:
+            address, error = None, str(e)
+
+        return address, error, round(time.perf_counter() - start, 6)
+
+    def submit(self, hosts) -> list:
+        """
+        Starts the lookups of the next chunk of **hosts**.
+        Returns ``(host, lookup)`` per host, where lookup is the result of
+        :py:meth:`gethostbyname` if the address is known or a future of it.
+        Each name is only looked up once per chunk.
+        """
+
+        chunk = []
+        lookups = {}
+
+        for host in itertools.islice(hosts, self.chunk_size):
+            name = host["host"]
+
+            if name not in lookups:
+                address = self.lookup(name)
+
+                if address is not None:
+                    lookups[name] = (address, None, 0)
+                else:
+                    lookups[name] = self.executor.submit(
+                        self.gethostbyname, name
+                    )
+
+            chunk.append((host, lookups[name]))
+
+        return chunk
+
+    def stream(self, hosts):
+        """
+        Yields the host objects of **hosts**, resolving a chunk of them
+        ahead. Sets ``ip`` of a host to its address or ``resolve_error`` to
+        the reason the lookup failed and ``resolve_time`` to the duration of
+        the lookup in seconds, ``0`` if the address was cached.
+        """
+
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers)
+
+        hosts = iter(hosts)
+        chunk = self.submit(hosts)
+
+        while chunk:
+            # Resolved while this chunk is handed out.
+            following = self.submit(hosts)
+
+            for host, lookup in chunk:
+                looked_up = isinstance(lookup, Future)
+
+                if looked_up:
+                    lookup = lookup.result()
+
+                address, error, seconds = lookup
+                host["resolve_time"] = seconds
+
+                if address is not None:
+                    host["ip"] = address
+
+                    if looked_up and self.ttl:
+                        self.cache[host["host"]] = \
+                            [address, time.time() + self.ttl]
+                        self.changed = True
+                else:
+                    host["resolve_error"] = error
+
+                yield host
+
+            chunk = following
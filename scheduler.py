@@ -0,0 +1,103 @@
+from collections import deque
+
+class Scheduler:
+    """
+    Hands out the hosts of one or more groups to an engine.
+
+    A host is only handed out if its group has less than ``forks`` hosts in
+    flight and the whole run has less than **max_sessions** hosts in flight.
+    Groups are served round-robin, so a small group is not starved by a large
+    one and the other way round.
+
+    Attributes:
+        groups (list): The group objects to run.
+        queues (collections.deque): ``(group object, host iterator)`` tuples of
+            groups that still have hosts to hand out.
+        forks (dict): The ``forks`` limit per group name.
+        in_flight (dict): Number of hosts in flight per group name.
+        in_flight_total (int): Number of hosts in flight in total.
+        max_sessions (int): Run-wide ceiling, ``None`` means no ceiling.
+            Set with ``max_sessions`` in ``defaults``.
+        peak_in_flight (int): Highest number of hosts in flight so far.
+        prepare (callable): Optional. Called with every host right before it
+            is handed out, e.g. to look up its credentials. Hosts are thus
+            prepared while earlier ones are already running.
+    """
+
+    def __init__(self, groups, max_sessions=None, prepare=None) -> None:
+        self.groups = groups
+        self.prepare = prepare
+        self.queues = deque(
+            [(obj, iter(obj["hosts"])) for obj in groups]
+        )
+        self.forks = {obj["group"]: obj["forks"] for obj in groups}
+        self.in_flight = {obj["group"]: 0 for obj in groups}
+        self.in_flight_total = 0
+        self.peak_in_flight = 0
+        self.max_sessions = max_sessions
+
+    @property
+    def capacity(self) -> int:
+        """
+        The largest number of hosts that can be in flight at the same time.
+        """
+
+        capacity = sum(self.forks.values())
+
+        if self.max_sessions is not None:
+            capacity = min(capacity, self.max_sessions)
+
+        return capacity
+
+    def next_job(self) -> tuple:
+        """
+        Returns ``(group object, host)`` for the next host that may be
+        started and reserves a slot for it. Returns ``None`` if no slot is
+        free or no hosts are left.
+        """
+
+        if self.max_sessions is not None and \
+                self.in_flight_total >= self.max_sessions:
+            return None
+
+        for i in range(len(self.queues)):
+            if not self.queues:
+                break
+
+            obj, hosts = self.queues[0]
+            self.queues.rotate(-1)
+
+            if self.in_flight[obj["group"]] >= obj["forks"]:
+                continue
+
+            host = next(hosts, None)
+
+            if host is None:
+                self.queues.remove((obj, hosts))
+                continue
+
+            if self.prepare is not None:
+                self.prepare(host)
+
+            self.in_flight[obj["group"]] += 1
+            self.in_flight_total += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight_total)
+
+            return obj, host
+
+        return None
+
+    def done(self, group) -> None:
+        """
+        Frees the slot of a host of **group** (the group name).
+        """
+
+        self.in_flight[group] -= 1
+        self.in_flight_total -= 1
+
+    def idle(self) -> bool:
+        """
+        Returns ``True`` if no host is in flight and none is left to start.
+        """
+
+        return self.in_flight_total == 0 and not self.queues
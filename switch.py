@@ -1,9 +1,13 @@
 import socket
-# import time
+import time
 # import random
 import re
 from pathlib import Path
 from netmiko import ConnectHandler
+# conquers libraries
+from credentials import\
+        decrypt_password,\
+        CryptoError
 
 class CsSwitchError(Exception):
     pass
@@ -17,6 +21,7 @@ class ChParams:
         user (str): User name
         password (str): 
         host (str): The hostname to connect to (can be an IP address, too).
+        port (int): SSH port.
         device_type (str): e.g. "cisco_ios". 
             Check out netmiko's `documentation
             <https://ktbyers.github.io/netmiko/docs/netmiko/index.html>`_ for your device type.
@@ -31,6 +36,7 @@ class ChParams:
         self.user = ""
         self.password = ""
         self.host = ""
+        self.port = 22
         self.device_type = ""
         self.conn_timeout = None
         self.read_timeout = None
@@ -46,6 +52,9 @@ class CsSwitch:
     Attributes:
         config (dict): pass
 
+        timings (dict): Durations recorded so far, see
+            :py:meth:`~switch.CsSwitch.take_timings`.
+
         params (:py:class:`~switch.ChParams`): 
             All the parameters needed for
             `netmiko <https://ktbyers.github.io/netmiko/docs/netmiko/>`_'s
@@ -53,16 +62,29 @@ class CsSwitch:
             to connect to a switch.
             Populated with values from :py:class:`~switch.CsSwitch.config` for readabilty and it's easier to
             write the needed keys that way.
+
+    Args:
+        config (dict): The host object. If it has an ``ip``, the host name
+            is not resolved again.
+        master_key (bytes): Used to decrypt the password right before
+            connecting, if the credentials only hold ``encrypted_pass``.
+        sessions (:py:class:`~daemon.SessionPool`): Optional. An open
+            session from the pool is used instead of connecting and
+            :py:meth:`release` hands it back.
     """
 
-    def __init__(self, config):
+    def __init__(self, config, master_key=None, sessions=None):
         self.config = config
+        self.sessions = sessions
+        self.session_key = None
+        self.timings = {}
         self.cmds = self.collect_commands()
         try:
             self.params = ChParams(
                 user = self.config["credentials"]["user"],
-                password = self.config["credentials"]["pass"],
+                password = self.config["credentials"].get("pass"),
                 host = self.config["credentials"]["host"],
+                port = int(self.config["settings"].get("port", 22)),
                 device_type = self.config["settings"]["device_type"],
                 conn_timeout = \
                     10 if "connection_timeout" not in self.config["settings"] \
@@ -76,16 +98,55 @@ class CsSwitch:
                 "Credentials error. Probably no entry for host."
             )
 
-        try:
-            self.params.ip = socket.gethostbyname(self.params.host)
-        except Exception as e:
-            raise CsSwitchError(e) from e
+        # Resolved by the parent, see resolver.Resolver.
+        if self.config.get("ip"):
+            self.params.ip = self.config["ip"]
+        else:
+            start = time.perf_counter()
+
+            try:
+                self.params.ip = socket.gethostbyname(self.params.host)
+            except Exception as e:
+                raise CsSwitchError(e) from e
+
+            self.timings["resolve"] = round(time.perf_counter() - start, 6)
+
+        if self.sessions is not None:
+            self.session_key = (
+                self.params.device_type,
+                self.params.ip,
+                self.params.port,
+                self.params.user,
+                self.config["credentials"].get("encrypted_pass")
+            )
+            start = time.perf_counter()
+            self.device = self.sessions.acquire(self.session_key)
+
+            if self.device is not None:
+                self.timings["connect"] = round(time.perf_counter() - start, 6)
+                return
+
+        # Decrypt as late as possible.
+        if self.params.password is None:
+            try:
+                self.params.password = decrypt_password(
+                    self.config["credentials"]["encrypted_pass"],
+                    master_key
+                )
+            except (CryptoError, KeyError, TypeError, ValueError) as e:
+                raise CsSwitchError(
+                    "Cannot decrypt password. " +
+                    "Probably the master key is not correct."
+                ) from e
 
         # Connect to switch
+        start = time.perf_counter()
+
         try:
             self.device = ConnectHandler(
                 device_type=self.params.device_type,
                 ip=self.params.ip,
+                port=self.params.port,
                 username=self.params.user,
                 password=self.params.password,
                 conn_timeout=self.params.conn_timeout
@@ -93,6 +154,8 @@ class CsSwitch:
         except Exception as e:
             raise CsSwitchError(e) from e
 
+        self.timings["connect"] = round(time.perf_counter() - start, 6)
+
     def send_cmds(self, cmd_set, type=None):
         """
         Sends commands distinguishing between configuration commands and show
@@ -128,6 +191,7 @@ class CsSwitch:
 
         for c in cmd_set:
             c_type = next(iter(c))
+            start = time.perf_counter()
 
             if c_type == "set":
                 try:
@@ -168,6 +232,10 @@ class CsSwitch:
             else:
                 raise CsSwitchError("Command set not recognized.")
 
+            self.timings.setdefault("cmd_sets", []).append(
+                round(time.perf_counter() - start, 6)
+            )
+
         return _output
 
     def send_cmds_ba(self, ba=None) -> str:
@@ -252,6 +320,8 @@ class CsSwitch:
         use_conf_cmd = "config_mode" in self.config["settings"]
         use_e_conf_cmd = "exit_config_mode" in self.config["settings"]
 
+        start = time.perf_counter()
+
         try:
             if use_conf_cmd:
                 self.device.config_mode(
@@ -265,10 +335,14 @@ class CsSwitch:
                 "Try setting config_mode in the configuration.\n"
             ) from e
 
+        self.timings["config_mode_enter"] = round(time.perf_counter() - start, 6)
+
         commands_set = self.split_into_sets(self.cmds["conf_cmds"])
         output = self.send_cmds(commands_set)
 
         # Exit configuration mode.
+        start = time.perf_counter()
+
         try:
             if use_e_conf_cmd:
                 self.device.exit_config_mode(
@@ -282,8 +356,59 @@ class CsSwitch:
                 "Try setting exit_config_mode in the configuration.\n"
             ) from e
 
+        self.timings["config_mode_exit"] = round(time.perf_counter() - start, 6)
+
         return output
 
+    def disconnect(self) -> None:
+        """
+        Closes the connection to the switch. Errors are ignored, the
+        session is gone either way.
+        """
+
+        try:
+            self.device.disconnect()
+        except Exception:
+            pass
+
+    def take_timings(self) -> dict:
+        """
+        Returns the timings recorded since the last call and starts over.
+        Durations are in seconds: ``resolve`` (if the switch resolved the
+        host name itself), ``connect``, ``config_mode_enter``,
+        ``config_mode_exit`` and ``cmd_sets``, one per command set sent by
+        :py:meth:`send_cmds`.
+        """
+
+        timings = self.timings
+        self.timings = {}
+
+        return timings
+
+    def use_config(self, config) -> None:
+        """
+        Makes **config**, another host object for the same switch, the one
+        whose commands and settings are used from now on. The session is
+        kept.
+        """
+
+        self.config = config
+        self.cmds = self.collect_commands()
+        self.params.read_timeout = self.config["settings"].get(
+            "read_timeout", 10.0
+        )
+
+    def release(self) -> None:
+        """
+        Hands the session back to the pool, so the next job for this switch
+        can use it. Without a pool the connection is closed.
+        """
+
+        if self.sessions is None:
+            self.disconnect()
+        else:
+            self.sessions.release(self.session_key, self.device)
+
     def save_config(self) -> None:
         """
         Since netmiko's `save_config
@@ -336,18 +461,16 @@ class CsSwitch:
             * ``conf_cmds_file: /path/to/file``
         """
 
-        create_cmd_arrays = [
-            "cmds_before",
-            "cmds_after",
-            "conf_cmds"
-        ]
-
-        for arr in create_cmd_arrays:
-            globals()[f"{arr}"] = []
+        cmds = {
+            "cmds_before": [],
+            "cmds_after": [],
+            "conf_cmds": []
+        }
 
+        for arr in cmds:
             if arr in self.config["settings"]:
                 for cmd in self.config["settings"][arr]:
-                    eval(f"{arr}.append(cmd)")
+                    cmds[arr].append(cmd)
 
             if f"{arr}_file" in self.config["settings"]:
                 path = self.config["settings"][f"{arr}_file"].replace(
@@ -371,10 +494,6 @@ class CsSwitch:
                     if l[:1] == "#":
                         continue
 
-                    eval(f"{arr}.append(l)")
+                    cmds[arr].append(l)
 
-        return {
-            "cmds_before": cmds_before,
-            "cmds_after": cmds_after,
-            "conf_cmds": conf_cmds
-        }
+        return cmds